@@ -1,6 +1,19 @@
-from .newsagent import news
-from .stockpriceagent import price
-from .portfolio_rag import rag
+from importlib import import_module
+
+# Loaded on first access, so importing one agent module does not load the others
+# (newsagent builds its sentiment pipeline at import time)
+_AGENTS = {
+    "news": ".newsagent",
+    "price": ".stockpriceagent",
+    "rag": ".portfolio_rag",
+}
+
+
+def __getattr__(name):
+    if name in _AGENTS:
+        return getattr(import_module(_AGENTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     "news",
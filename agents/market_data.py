@@ -0,0 +1,57 @@
+import time
+import datetime
+import threading
+import pandas as pd
+import yfinance as yf
+from outbound import policy
+
+# How long fetched daily closes are reused before hitting Yahoo Finance again
+HISTORY_TTL_SECONDS = 15 * 60
+
+# ticker -> (fetched_at, start date covered, daily close Series)
+_history_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _download_closes(tickers: list[str], start: datetime.date) -> pd.DataFrame:
+    """One bulk Yahoo Finance request for all `tickers`; columns are tickers."""
+    data = policy("yfinance").call(yf.download, tickers, start=start.isoformat(), auto_adjust=True,
+                                   progress=False, threads=True, key=("download", tuple(tickers), start))
+    if data.empty:
+        return pd.DataFrame()
+    closes = data["Close"]
+    if isinstance(closes, pd.Series):
+        closes = closes.to_frame(tickers[0])
+    closes.index = pd.to_datetime(closes.index).tz_localize(None).normalize()
+    return closes
+
+
+def get_close_history(tickers: list[str], start: datetime.date) -> pd.DataFrame:
+    """
+    Daily adjusted closes from `start` to today, one column per ticker, on a shared
+    trading-day index (gaps forward-filled).
+    Tickers not cached, cached from a later start, or older than
+    HISTORY_TTL_SECONDS are re-fetched together in a single bulk request.
+    """
+    tickers = sorted({t.upper() for t in tickers})
+    now = time.time()
+    with _cache_lock:
+        stale = [
+            t for t in tickers
+            if t not in _history_cache
+            or now - _history_cache[t][0] > HISTORY_TTL_SECONDS
+            or _history_cache[t][1] > start
+        ]
+
+    if stale:
+        fetched = _download_closes(stale, start)
+        with _cache_lock:
+            for t in stale:
+                series = fetched[t].dropna() if t in fetched else pd.Series(dtype="float64")
+                _history_cache[t] = (now, start, series)
+
+    with _cache_lock:
+        series = {t: _history_cache[t][2] for t in tickers}
+    frame = pd.DataFrame(series)
+    frame = frame[frame.index >= pd.Timestamp(start)]
+    return frame.sort_index().ffill()
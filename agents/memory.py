@@ -0,0 +1,83 @@
+import uuid
+from langchain_openai import ChatOpenAI
+from outbound import openai_client_kwargs
+from langchain_core.messages import HumanMessage, RemoveMessage, SystemMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+# Conversation memory budget (approximate tokens) kept in the checkpointed thread
+MAX_HISTORY_TOKENS = 4000
+# Most recent user turns that are always kept verbatim
+KEEP_RECENT_TURNS = 2
+# Id shared by all summary messages so each compaction replaces the previous one
+SUMMARY_ID = "conversation-summary"
+
+
+def create_checkpointer():
+    """Process-wide checkpointer holding one message thread per session."""
+    return InMemorySaver()
+
+
+def new_thread_config(**configurable) -> dict:
+    """Graph config for a fresh conversation thread (extra keys go into "configurable")."""
+    return {"configurable": {"thread_id": str(uuid.uuid4()), **configurable}}
+
+
+def summarize_messages(messages, previous_summary: str = "") -> str:
+    """
+    Condenses older conversation turns into a short factual summary.
+    Keeps tickers, purchase data, prices and conclusions so follow-ups can reuse them.
+    """
+    transcript = "\n".join(
+        f"{m.type}: {m.content}" for m in messages if isinstance(m.content, str) and m.content.strip()
+    )
+    prompt = f"""Summarize the conversation below between a user and a portfolio assistant.
+Keep every ticker, purchase date, purchase price, share count, current price and conclusion.
+Drop routing chatter and tool plumbing. Reply with the summary only.
+
+Previous summary:
+{previous_summary or "(none)"}
+
+Conversation:
+{transcript}"""
+    return ChatOpenAI(model="gpt-4o-mini", **openai_client_kwargs()).invoke(prompt).content
+
+
+def compact_history(graph, config: dict,
+                    max_tokens: int = MAX_HISTORY_TOKENS,
+                    keep_recent: int = KEEP_RECENT_TURNS) -> bool:
+    """
+    Keeps the checkpointed thread under `max_tokens`.
+    When over budget, every turn older than the last `keep_recent` user turns is
+    removed from the thread and folded into a single summary message.
+    Returns True if the history was compacted.
+    """
+    state = graph.get_state(config)
+    messages = state.values.get("messages", []) if state.values else []
+    if count_tokens_approximately(messages) <= max_tokens:
+        return False
+
+    # Cut only at user-turn boundaries so tool calls stay paired with their results
+    human_idx = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+    if len(human_idx) <= keep_recent:
+        return False
+    cut = human_idx[-keep_recent]
+
+    old, recent = messages[:cut], messages[cut:]
+    previous_summary = next((m.content for m in old if m.id == SUMMARY_ID), "")
+    to_summarize = [m for m in old if m.id != SUMMARY_ID and not isinstance(m, SystemMessage)]
+    summary = summarize_messages(to_summarize, previous_summary)
+
+    # Rewrite the thread as [summary, *recent] so the summary stays in front
+    graph.update_state(
+        config,
+        {"messages": [
+            RemoveMessage(id=REMOVE_ALL_MESSAGES),
+            SystemMessage(content=f"Summary of the earlier conversation:\n{summary}", id=SUMMARY_ID),
+            *recent,
+        ]},
+        as_node="supervisor",
+    )
+    print(f"🧹 Compacted {len(old)} messages into a summary")
+    return True
@@ -1,8 +1,10 @@
 import yfinance as yf
+import asyncio
 import datetime
 from langchain.tools import tool
 from langgraph.prebuilt import create_react_agent
 from langchain_openai import ChatOpenAI
+from outbound import openai_client_kwargs, policy
 from langchain_community.tools.yahoo_finance_news import YahooFinanceNewsTool
 from transformers import pipeline
 
@@ -20,7 +22,15 @@ def get_finance_news(query: str) -> str:
     """
     yfnewstool = YahooFinanceNewsTool()
 
-    return yfnewstool.invoke(query)
+    return policy("yahoo-news").call(yfnewstool.invoke, query, key=("news", query.strip().upper()))
+
+async def aget_finance_news(query: str) -> str:
+    """Async get_finance_news: retries and throttling wait on the event loop."""
+    yfnewstool = YahooFinanceNewsTool()
+
+    return await policy("yahoo-news").acall(yfnewstool.ainvoke, query, key=("news", query.strip().upper()))
+
+get_finance_news.coroutine = aget_finance_news
 
 sentiment_pipeline = pipeline(model="distilbert/distilbert-base-uncased-finetuned-sst-2-english")
 # sentiment_pipeline = pipeline("sentiment-analysis")
@@ -39,7 +49,19 @@ def summarize_news_tone(ticker: str) -> str:
              Includes a count breakdown (positive, negative, neutral) and 2–3 example headlines with sentiment labels.
              If no headlines are found, a fallback message is returned.
     """
-    raw_headlines = YahooFinanceNewsTool().run(ticker)
+    raw_headlines = policy("yahoo-news").call(YahooFinanceNewsTool().run, ticker,
+                                               key=("news", ticker.strip().upper()))
+    return _news_tone(ticker, raw_headlines)
+
+async def asummarize_news_tone(ticker: str) -> str:
+    """Async summarize_news_tone: headlines fetched without blocking, sentiment scored in a worker thread."""
+    raw_headlines = await policy("yahoo-news").acall(YahooFinanceNewsTool().arun, ticker,
+                                                      key=("news", ticker.strip().upper()))
+    return await asyncio.to_thread(_news_tone, ticker, raw_headlines)
+
+summarize_news_tone.coroutine = asummarize_news_tone
+
+def _news_tone(ticker: str, raw_headlines: str) -> str:
     headlines = [h.strip() for h in raw_headlines.split("\n") if h.strip()]
 
     if not headlines:
@@ -133,7 +155,7 @@ OUTPUT RULES:
 
 
 
-news = create_react_agent(model=ChatOpenAI(model="gpt-4o-mini"),
+news = create_react_agent(model=ChatOpenAI(model="gpt-4o-mini", **openai_client_kwargs()),
                                      tools=[get_finance_news, summarize_news_tone],
                                      name="news",
                                      prompt=news_sentiment_prompt)
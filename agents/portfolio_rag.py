@@ -3,48 +3,68 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 import os
+import asyncio
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 
 
 from langgraph.prebuilt import create_react_agent
 from langchain.tools import tool
-from retrieval.faiss_store import build_retriever
+from langchain_core.runnables import RunnableConfig
+from retrieval.index_manager import index_manager, DEFAULT_CLIENT
 from retrieval.retriever import create_rag_chain
 from preprocessing.summarize_pdf import ingest
 from langchain_openai import ChatOpenAI
+from outbound import openai_client_kwargs
 
 # Optional: if running for first time
 # ingest("tests/test2.pdf")  # or dynamically load PDF
-# retriever = build_retriever("summaries.json")
-# rag_chain = create_rag_chain(retriever)
+# init_rag("summaries.json")
 
-retriever = None       
-rag_chain = None
+# Retrievers are per client (see retrieval/index_manager.py); the chain is shared
+rag_chain = create_rag_chain()
 
-def init_rag(summary_path: str):
-    """Build (or rebuild) the retriever + chain."""
-    global retriever, rag_chain
-    retriever = build_retriever(summary_path)
-    rag_chain = create_rag_chain(retriever)
+def init_rag(summary_path: str, client_id: str = DEFAULT_CLIENT):
+    """Build (or rebuild) the client's retriever."""
+    return index_manager.build(client_id, summary_path)
 
 @tool("answer_investment_question")
-def answer_investment_question(question: str) -> str:
+def answer_investment_question(question: str, config: RunnableConfig) -> str:
     """Answers investment-related questions using previously summarized PDFs.
     """
-
+    # The caller picks the client namespace via config={"configurable": {"client_id": ...}}
+    client_id = config.get("configurable", {}).get("client_id", DEFAULT_CLIENT)
+    retriever = index_manager.get(client_id)
     if retriever is None:
         return "No documents ingested yet. Please upload a PDF."
 
     docs = retriever.invoke(question)
+    _print_docs(docs)
+
+    # Now feed the same documents into the chain (no second retrieval)
+    return rag_chain.invoke({"docs": docs, "question": question})
+
+
+async def aanswer_investment_question(question: str, config: RunnableConfig) -> str:
+    """Async answer_investment_question: cold index loads run in a worker thread, the LLM call is awaited."""
+    client_id = config.get("configurable", {}).get("client_id", DEFAULT_CLIENT)
+    retriever = await asyncio.to_thread(index_manager.get, client_id)
+    if retriever is None:
+        return "No documents ingested yet. Please upload a PDF."
+
+    docs = await retriever.ainvoke(question)
+    _print_docs(docs)
+    return await rag_chain.ainvoke({"docs": docs, "question": question})
+
+answer_investment_question.coroutine = aanswer_investment_question
+
+
+def _print_docs(docs):
     for i, doc in enumerate(docs):
         if hasattr(doc, "page_content"):
             print(f"\nRetrieved context {i + 1}:\n{doc.page_content}")
         else:
             print(f"\nRetrieved raw item {i + 1}:\n{doc}")
 
-    # Now feed it into the chain
-    return rag_chain.invoke(question)
-
 
 rag_prompt = """
 You are a financial portfolio analysis assistant using ReAct-style reasoning.
@@ -112,7 +132,7 @@ OUTPUT RULES (MANDATORY):
 
 
 rag = create_react_agent(
-    model=ChatOpenAI(model="gpt-4o-mini"),
+    model=ChatOpenAI(model="gpt-4o-mini", **openai_client_kwargs()),
     tools=[answer_investment_question],
     name="rag",
     prompt=rag_prompt
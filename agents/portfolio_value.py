@@ -0,0 +1,130 @@
+import re
+import json
+import datetime
+from collections import Counter, defaultdict
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from agents.market_data import get_close_history
+
+# "- MSFT: 10 shares @ 242.5 (bought 2022-11-15)" as written by ingest()
+BULLET_RE = re.compile(r"-\s*([A-Z.\-]+):\s*([\d.]+)\s*shares\s*@\s*([\d.]+)\s*\(bought\s*(\d{4}-\d{2}-\d{2})\)")
+
+
+LOT_FIELDS = ("ticker", "purchase_date", "price", "shares")
+
+
+def _lot_key(lot: dict) -> tuple | None:
+    try:
+        return (str(lot["ticker"]).upper(), datetime.date.fromisoformat(str(lot["purchase_date"])),
+                float(lot["price"]), float(lot["shares"]))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def load_lots(summary_path: str) -> list[dict]:
+    """
+    Purchase lots ({ticker, purchase_date, price, shares}) from a summaries.json.
+    Uses the parsed table rows, or the purchase_entry bullets for files written
+    before rows were stored.
+    """
+    path = Path(summary_path)
+    if not path.exists():
+        return []
+    items = json.loads(path.read_text())
+
+    # One group of lots per table
+    groups = [item.get("rows") or [] for item in items if item.get("type") == "table"]
+    if not any(groups):
+        bullets = defaultdict(list)
+        for item in items:
+            if item.get("type") == "purchase_entry":
+                m = BULLET_RE.search(item.get("summary", ""))
+                if m:
+                    bullets[item.get("raw")].append({"ticker": m.group(1), "shares": float(m.group(2)),
+                                                     "price": float(m.group(3)), "purchase_date": m.group(4)})
+        groups = list(bullets.values())
+
+    # The same lot can appear in several tables (one found by both extractors but
+    # fingerprinted differently, or a holdings table repeating the transactions).
+    # Keep each lot as many times as the table listing it most often does, so
+    # identical buys within one table still count.
+    counts = Counter()
+    for group in groups:
+        for key, n in Counter(k for k in map(_lot_key, group) if k is not None).items():
+            counts[key] = max(counts[key], n)
+    return [dict(zip(LOT_FIELDS, key)) for key, n in counts.items() for _ in range(n)]
+
+
+def valuation_series(lots: list[dict]) -> pd.DataFrame:
+    """
+    Daily market value and cost basis of all lots from the first purchase to today.
+
+    Lots become share / cost "events" on their purchase day in a (days x tickers)
+    matrix; a cumulative sum turns them into holdings, multiplied element-wise by
+    the aligned close matrix. Columns: value, cost_basis, pnl, return_pct, plus
+    one market-value column per ticker.
+    """
+    if not lots:
+        return pd.DataFrame(columns=["value", "cost_basis", "pnl", "return_pct"])
+
+    tickers = sorted({lot["ticker"] for lot in lots})
+    start = min(lot["purchase_date"] for lot in lots)
+    history = get_close_history(tickers, start).reindex(columns=tickers)
+    if history.empty:
+        return pd.DataFrame(columns=["value", "cost_basis", "pnl", "return_pct"])
+
+    closes = history.to_numpy(dtype="float64")
+    dates = history.index.to_numpy().astype("datetime64[D]")
+    T, N = closes.shape
+
+    col = {t: j for j, t in enumerate(tickers)}
+    j = np.array([col[lot["ticker"]] for lot in lots])
+    s = np.searchsorted(dates, np.array([lot["purchase_date"] for lot in lots], dtype="datetime64[D]"))
+    q = np.array([lot["shares"] for lot in lots])
+    p = np.array([lot["price"] for lot in lots])
+
+    # Row T collects lots dated after the last trading day; it is dropped below
+    share_events = np.zeros((T + 1, N))
+    cost_events = np.zeros((T + 1, N))
+    np.add.at(share_events, (s, j), q)
+    np.add.at(cost_events, (s, j), q * p)
+    held = np.cumsum(share_events[:-1], axis=0)
+    cost = np.cumsum(cost_events[:-1], axis=0)
+
+    market = held * np.nan_to_num(closes)
+    value = market.sum(axis=1)
+    cost_basis = cost.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return_pct = np.where(cost_basis > 0, (value / cost_basis - 1) * 100, np.nan)
+
+    frame = pd.DataFrame(
+        {"value": value, "cost_basis": cost_basis, "pnl": value - cost_basis, "return_pct": return_pct},
+        index=history.index,
+    )
+    return frame.join(pd.DataFrame(market, index=history.index, columns=tickers))
+
+
+def summarize_valuation(frame: pd.DataFrame, points: int = 24) -> dict:
+    """Compact JSON-able summary of a valuation series, with at most `points` samples."""
+    if frame.empty:
+        return {}
+    last = frame.iloc[-1]
+    step = max(1, len(frame) // points)
+    sampled = frame.iloc[::step]
+    if sampled.index[-1] != frame.index[-1]:
+        sampled = pd.concat([sampled, frame.iloc[[-1]]])
+    return {
+        "from": str(frame.index[0].date()),
+        "as_of": str(frame.index[-1].date()),
+        "value": round(float(last["value"]), 2),
+        "cost_basis": round(float(last["cost_basis"]), 2),
+        "pnl": round(float(last["pnl"]), 2),
+        "return_pct": None if np.isnan(last["return_pct"]) else round(float(last["return_pct"]), 2),
+        "peak_value": round(float(frame["value"].max()), 2),
+        "peak_date": str(frame["value"].idxmax().date()),
+        "series": [
+            {"date": str(d.date()), "value": round(float(v), 2), "cost_basis": round(float(c), 2)}
+            for d, v, c in zip(sampled.index, sampled["value"], sampled["cost_basis"])
+        ],
+    }
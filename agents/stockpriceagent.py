@@ -1,9 +1,17 @@
 import json
+import asyncio
 import yfinance as yf
 import datetime
+import numpy as np
 from langchain.tools import tool
+from langchain_core.runnables import RunnableConfig
 from langgraph.prebuilt import create_react_agent
 from langchain_openai import ChatOpenAI
+from outbound import openai_client_kwargs, policy
+from agents.market_data import get_close_history
+from agents.technicals import DEFAULT_WINDOWS, MOVING_AVERAGES, window_start, window_stats, moving_averages
+from agents.portfolio_value import load_lots, valuation_series, summarize_valuation
+from retrieval.index_manager import index_manager, DEFAULT_CLIENT
 
 
 @tool
@@ -22,8 +30,23 @@ def get_stock_price(symbol: str, date: str) -> str:
     
     ticker = yf.Ticker(symbol)
     
-    hist = ticker.history(start=date_obj, end=date_obj + datetime.timedelta(days=1))
-    
+    hist = policy("yfinance").call(ticker.history, start=date_obj, end=date_obj + datetime.timedelta(days=1),
+                                   key=("history", symbol.upper(), date))
+    return _format_close(symbol, date, hist)
+
+
+async def aget_stock_price(symbol: str, date: str) -> str:
+    """Async get_stock_price: the Yahoo request runs in a worker thread, retries wait on the event loop."""
+    date_obj = datetime.datetime.strptime(date, '%Y-%m-%d')
+    hist = await policy("yfinance").acall(asyncio.to_thread, yf.Ticker(symbol).history,
+                                          start=date_obj, end=date_obj + datetime.timedelta(days=1),
+                                          key=("history", symbol.upper(), date))
+    return _format_close(symbol, date, hist)
+
+get_stock_price.coroutine = aget_stock_price
+
+
+def _format_close(symbol: str, date: str, hist) -> str:
     if len(hist) == 0:
         return f"Stock price data for {symbol} on {date} isn't available"
         
@@ -47,8 +70,21 @@ def get_price_trend(ticker: str, days: int = 7) -> str:
     Returns:
         The percentage change and trend direction over the specified time range.
     """
-    data = yf.Ticker(ticker).history(period=f"{days}d")
+    data = policy("yfinance").call(yf.Ticker(ticker).history, period=f"{days}d",
+                                   key=("history", ticker.upper(), f"{days}d"))
+    return _format_trend(ticker, days, data)
+
 
+async def aget_price_trend(ticker: str, days: int = 7) -> str:
+    """Async get_price_trend."""
+    data = await policy("yfinance").acall(asyncio.to_thread, yf.Ticker(ticker).history, period=f"{days}d",
+                                          key=("history", ticker.upper(), f"{days}d"))
+    return _format_trend(ticker, days, data)
+
+get_price_trend.coroutine = aget_price_trend
+
+
+def _format_trend(ticker: str, days: int, data) -> str:
     if len(data) < 2:
         return f"Not enough data to calculate {days}-day trend for {ticker}."
 
@@ -59,13 +95,101 @@ def get_price_trend(ticker: str, days: int = 7) -> str:
     trend = "up" if pct_change > 0 else "down"
     return f"{ticker} is {trend} {abs(pct_change):.2f}% over the last {days} days."
 
+def _pct(x) -> float | None:
+    return None if np.isnan(x) else round(float(x) * 100, 2)
+
+
+@tool
+def get_price_analytics(tickers: str, windows: str = ",".join(DEFAULT_WINDOWS)) -> str:
+    """
+    Computes multi-window performance and risk analytics for one or more stocks in a single call.
+
+    Args:
+        tickers: Comma-separated stock symbols (e.g. 'NVDA' or 'AAPL,MSFT,NVDA')
+        windows: Comma-separated look-back windows such as '1w,1m,3m,6m,ytd,1y' (also '5d', '2y')
+
+    Returns:
+        A JSON string with, per ticker: last close, per-window return %, annualized
+        volatility % and max drawdown %, and the 20/50/200-day simple moving averages.
+    """
+    symbols = [t.strip().upper() for t in tickers.split(",") if t.strip()]
+    names = [w.strip().lower() for w in windows.split(",") if w.strip()]
+    today = datetime.date.today()
+    try:
+        starts = [window_start(w, today) for w in names]
+    except ValueError as e:
+        return str(e)
+
+    # One history range covers every window plus the longest moving average
+    fetch_from = min(starts + [today - datetime.timedelta(days=int(max(MOVING_AVERAGES) * 1.5))])
+    history = get_close_history(symbols, fetch_from).dropna(axis=1, how="all")
+    if len(history) < 2:
+        return f"Not enough price data for {', '.join(symbols)}."
+
+    closes = history.to_numpy(dtype="float64")
+    dates = history.index.to_numpy().astype("datetime64[D]")
+    stats = window_stats(dates, closes, starts)
+    smas = moving_averages(closes)
+
+    result = {"as_of": str(dates[-1]), "tickers": {}}
+    for j, sym in enumerate(history.columns):
+        result["tickers"][sym] = {
+            "last": round(float(closes[-1, j]), 2),
+            "windows": {
+                w: {
+                    "return_pct": _pct(stats["return"][i, j]),
+                    "volatility_pct": _pct(stats["volatility"][i, j]),
+                    "max_drawdown_pct": _pct(stats["max_drawdown"][i, j]),
+                }
+                for i, w in enumerate(names)
+            },
+            "sma": {str(k): (None if np.isnan(v[j]) else round(float(v[j]), 2)) for k, v in smas.items()},
+        }
+    missing = sorted(set(symbols) - set(history.columns))
+    if missing:
+        result["no_data"] = missing
+    return json.dumps(result, separators=(",", ":"))
+
+
+async def aget_price_analytics(tickers: str, windows: str = ",".join(DEFAULT_WINDOWS)) -> str:
+    """Async get_price_analytics: bulk fetch and numpy work run off the event loop."""
+    return await asyncio.to_thread(get_price_analytics.func, tickers, windows)
+
+get_price_analytics.coroutine = aget_price_analytics
+
+@tool
+def get_portfolio_history(config: RunnableConfig) -> str:
+    """
+    Computes how the value of the user's ingested portfolio has moved day by day since each purchase.
+
+    Returns:
+        A JSON string with the current market value, cost basis, P/L and return %, the peak value
+        and its date, and a sampled series of {date, value, cost_basis} points.
+        If no holdings have been ingested, returns a message indicating that.
+    """
+    client_id = config.get("configurable", {}).get("client_id", DEFAULT_CLIENT)
+    lots = load_lots(index_manager.summary_path(client_id))
+    if not lots:
+        return "No holdings found. Please upload a portfolio PDF first."
+    summary = summarize_valuation(valuation_series(lots))
+    if not summary:
+        return "Price history for the portfolio holdings isn't available."
+    return json.dumps(summary, separators=(",", ":"))
+
+
+async def aget_portfolio_history(config: RunnableConfig) -> str:
+    """Async get_portfolio_history."""
+    return await asyncio.to_thread(get_portfolio_history.func, config)
+
+get_portfolio_history.coroutine = aget_portfolio_history
+
 TODAY = datetime.date.today().strftime("%Y-%m-%d")
 
 financial_stock_prompt = """
 You are a financial assistant agent using ReAct-style reasoning.
 You help users retrieve accurate stock price information.
 
-You have access to two tools:
+You have access to four tools:
 
 1. `get_stock_price(ticker: str, date: str)`
    → Use this when the user asks for the price of a stock on a specific date, or uses words like “current”, “today”, or “now”.
@@ -73,6 +197,13 @@ You have access to two tools:
 2. `get_price_trend(ticker: str, days: int)`
    → Use this when the user asks about recent performance, trend, or movement over time (e.g., past 7 days, last week).
 
+3. `get_price_analytics(tickers: str, windows: str)`
+   → Use this when the user asks about several periods at once (e.g. 1w / 1m / YTD), volatility, drawdown,
+     moving averages, or compares several tickers. Pass all tickers and windows in ONE call.
+
+4. `get_portfolio_history()`
+   → Use this when the user asks how their whole portfolio's value has changed over time / since purchase.
+
 ---
 
 THINK → DECIDE → ACT
@@ -83,6 +214,8 @@ When you receive a user query:
   - “current price”, “today’s price”, or “price now” → use `get_stock_price(ticker, date=TODAY)`
   - A specific historical date → use `get_stock_price(ticker, date)`
   - Recent trend, performance, movement → use `get_price_trend`
+  - Multiple periods, volatility, drawdown, moving averages, or several tickers → use `get_price_analytics`
+  - The value of their portfolio over time → use `get_portfolio_history`
 
 ---
 
@@ -91,6 +224,7 @@ EXAMPLES:
 - "What was AAPL's price on May 10?" → use `get_stock_price("AAPL", "2024-05-10")`
 - "What is MSFT's price today?" → use `get_stock_price("MSFT", TODAY)`
 - "How has TSLA moved in the past week?" → use `get_price_trend("TSLA", 7)`
+- "How has NVDA done over 1w/1m/YTD, and how volatile is it?" → use `get_price_analytics("NVDA", "1w,1m,ytd")`
 
 ---
 
@@ -103,8 +237,8 @@ OUTPUT RULES:
 
 
 
-price = create_react_agent(model=ChatOpenAI(model="gpt-4o-mini"),
-                                     tools=[get_stock_price, get_price_trend],
+price = create_react_agent(model=ChatOpenAI(model="gpt-4o-mini", **openai_client_kwargs()),
+                                     tools=[get_stock_price, get_price_trend, get_price_analytics, get_portfolio_history],
                                      name="price",
                                      prompt=financial_stock_prompt)
 
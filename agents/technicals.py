@@ -0,0 +1,76 @@
+import re
+import datetime
+import numpy as np
+
+TRADING_DAYS = 252
+DEFAULT_WINDOWS = ("1w", "1m", "3m", "6m", "ytd", "1y")
+MOVING_AVERAGES = (20, 50, 200)
+WINDOW_RE = re.compile(r"^(\d+)([dwmy])$")
+
+
+def window_start(window: str, today: datetime.date) -> datetime.date:
+    """Calendar start date of a window such as "5d", "1w", "3m", "1y" or "ytd"."""
+    window = window.strip().lower()
+    if window == "ytd":
+        return datetime.date(today.year, 1, 1)
+    m = WINDOW_RE.match(window)
+    if not m:
+        raise ValueError(f"Unknown window {window!r}; use e.g. 5d, 1w, 3m, 1y or ytd")
+    n, unit = int(m.group(1)), m.group(2)
+    days = {"d": 1, "w": 7, "m": 30.4375, "y": 365.25}[unit] * n
+    return today - datetime.timedelta(days=round(days))
+
+
+def window_stats(dates: np.ndarray, closes: np.ndarray, starts: list[datetime.date]) -> dict:
+    """
+    Per-window return, annualized volatility and max drawdown for every ticker at once.
+
+    dates:  (T,) datetime64[D] trading days, ascending
+    closes: (T, N) closes, one column per ticker (NaN before a ticker's history starts)
+    starts: W window start dates
+
+    Returns arrays of shape (W, N): "return", "volatility", "max_drawdown".
+    """
+    T, N = closes.shape
+    # First trading day on/after each window start → (W,)
+    s = np.searchsorted(dates, np.array(starts, dtype="datetime64[D]"))
+    s = np.minimum(s, T - 1)
+
+    # Simple return from each window's first close to the last close
+    ret = closes[-1][None, :] / closes[s] - 1                       # (W, N)
+
+    # Annualized volatility of daily log returns inside each window, via prefix sums
+    r = np.diff(np.log(closes), axis=0)                            # (T-1, N)
+    valid = ~np.isnan(r)
+    r0 = np.where(valid, r, 0.0)
+    pad = np.zeros((1, N))
+    cs  = np.vstack([pad, np.cumsum(r0, axis=0)])                  # (T, N)
+    cs2 = np.vstack([pad, np.cumsum(r0 ** 2, axis=0)])
+    cnt = np.vstack([pad, np.cumsum(valid, axis=0)])
+    # Returns inside window w are r[s_w:], i.e. prefix index s_w .. T-1
+    n = cnt[-1][None, :] - cnt[s]
+    mean = (cs[-1][None, :] - cs[s]) / np.maximum(n, 1)
+    var = ((cs2[-1][None, :] - cs2[s]) - n * mean ** 2) / np.maximum(n - 1, 1)
+    vol = np.sqrt(np.clip(var, 0, None) * TRADING_DAYS)
+    vol[n < 2] = np.nan
+
+    # Max drawdown: mask each window's prefix and run one cumulative max over (W, T, N)
+    t = np.arange(T)
+    inside = t[None, :] >= s[:, None]                               # (W, T)
+    windowed = np.where(inside[:, :, None], closes[None, :, :], np.nan)
+    peak = np.fmax.accumulate(windowed, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        drawdown = windowed / peak - 1
+    all_nan = np.all(np.isnan(drawdown), axis=1)
+    mdd = np.where(all_nan, np.nan, np.nanmin(np.where(np.isnan(drawdown), np.inf, drawdown), axis=1))
+
+    return {"return": ret, "volatility": vol, "max_drawdown": mdd}
+
+
+def moving_averages(closes: np.ndarray, lengths=MOVING_AVERAGES) -> dict:
+    """Latest simple moving average per length → {length: (N,)}; NaN if history is too short."""
+    T = closes.shape[0]
+    return {
+        k: (np.nanmean(closes[-k:], axis=0) if T >= k else np.full(closes.shape[1], np.nan))
+        for k in lengths
+    }
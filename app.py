@@ -1,13 +1,12 @@
 import os
-import datetime
-from pathlib import Path
-import shutil
+import uuid
 import streamlit as st
-from langchain_openai import ChatOpenAI
-from langgraph_supervisor import create_supervisor
-from preprocessing.summarize_pdf import ingest
-from agents import news, price, rag
-from agents.portfolio_rag import init_rag
+from outbound import metrics
+from supervisor import build_prompt, build_supervisor, date_context_message
+from preprocessing.job_queue import JobQueue, job_progress
+from retrieval.index_manager import index_manager
+from agents.portfolio_value import load_lots, valuation_series
+from agents.memory import create_checkpointer, new_thread_config, compact_history
 from langchain_core.messages import AIMessage, convert_to_messages
 
 def pretty_print_message(message, indent=False):
@@ -60,118 +59,105 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
 if "ingested_files" not in st.session_state:
     st.session_state.ingested_files = set()
+if "client_id" not in st.session_state:
+    # ?client=<id> reopens a client's index; otherwise each session gets its own
+    st.session_state.client_id = st.query_params.get("client") or uuid.uuid4().hex
+if "thread_config" not in st.session_state:
+    st.session_state.thread_config = new_thread_config(client_id=st.session_state.client_id)
 
 # ── PDF Upload ─────────────────────────────────────────────────────────────────
 st.subheader("📄 Upload a PDF")
-UPLOAD_DIR = "streamlit_upload"
-INDEX_DIR = Path("faiss_index_folder")
+UPLOAD_DIR = os.path.join("streamlit_upload", st.session_state.client_id)
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+@st.cache_resource
+def get_job_queue():
+    """Process-wide ingest queue and worker pool, shared by all sessions."""
+    return JobQueue().start()
+
+
+job_queue = get_job_queue()
+
 uploaded = st.file_uploader("Drop a PDF", type=["pdf"])
 if uploaded:
     file_path = os.path.join(UPLOAD_DIR, uploaded.name)
     if file_path not in st.session_state.ingested_files:
         with open(file_path, "wb") as f:
             f.write(uploaded.getbuffer())
-        st.success(f"Saved to `{file_path}`")
-        if INDEX_DIR.exists():
-            shutil.rmtree(INDEX_DIR)
-        ingest(file_path)
-        init_rag("summaries.json")
+        st.success(f"Saved to `{file_path}` — ingesting in the background")
+        summary_path = os.path.join(UPLOAD_DIR, "summaries.json")
+        job_queue.submit(st.session_state.client_id, file_path, summary_path)
         st.session_state.ingested_files.add(file_path)
     else:
         st.info(f"🔁 File already ingested: {uploaded.name}")
 
+# Ingest progress refreshes on its own (every 2s while jobs are active) without rerunning the page
+jobs = job_queue.jobs_for(st.session_state.client_id, limit=5)
+active = any(job["status"] in {"queued", "running"} for job in jobs)
+
+@st.fragment(run_every=2 if active else None)
+def show_ingest_jobs():
+    current = job_queue.jobs_for(st.session_state.client_id, limit=5)
+    if active and not any(job["status"] in {"queued", "running"} for job in current):
+        st.rerun()   # all jobs finished: full rerun to stop polling
+    for job in current:
+        name = os.path.basename(job["pdf_path"])
+        if job["status"] == "failed":
+            st.error(f"❌ {name}: {job['error']}")
+        elif job["status"] == "done":
+            st.caption(f"✅ {name} indexed")
+        else:
+            stage = job["stage"] or "queued"
+            done, total = job["progress"].get(stage, [0, 0])
+            st.progress(job_progress(job), text=f"⏳ {name} — {stage} ({done}/{total})")
+    if active:
+        st.caption("You can keep chatting; answers use your previous documents until indexing finishes.")
+
+show_ingest_jobs()
+
+# ── Portfolio Value Over Time ──────────────────────────────────────────────────
+@st.cache_data(ttl=15 * 60, show_spinner="Loading price history…")
+def load_valuation(summary_path: str, mtime: float):
+    """Daily value / cost basis of the ingested lots (cached per summaries file version)."""
+    return valuation_series(load_lots(summary_path))
+
+summary_file = index_manager.summary_path(st.session_state.client_id)
+if summary_file.exists():
+    with st.expander("📈 Portfolio value over time"):
+        valuation = load_valuation(str(summary_file), summary_file.stat().st_mtime)
+        if valuation.empty:
+            st.caption("No purchase lots found in the ingested documents.")
+        else:
+            st.line_chart(valuation[["value", "cost_basis"]])
+            last = valuation.iloc[-1]
+            st.caption(f"Value ${last['value']:,.2f} · cost basis ${last['cost_basis']:,.2f} · "
+                       f"P/L ${last['pnl']:,.2f} ({last['return_pct']:+.2f}%)")
+
+with st.sidebar.expander("Index cache"):
+    st.json(index_manager.snapshot())
+
+with st.sidebar.expander("Outbound calls"):
+    st.json(metrics())
+
 st.divider()
 
 # ── Supervisor Agent ───────────────────────────────────────────────────────────
-supervisor_prompt = f"""
-You are Portfolio-GPT Supervisor — a high-level orchestrator responsible for answering investment-related questions by routing tasks to 3 specialized agents:
-
-- **rag** → Portfolio data & investment analysis (from uploaded PDFs)
-- **price** → Live stock prices and trends (via Yahoo Finance)
-- **news** → Latest headlines & sentiment
-
----
-
-THINK → DECIDE → ACT
-
-Use the following routing rules to determine which agent to call:
-
----
-
-1. PORTFOLIO ANALYSIS & COMMENTARY (rag only)
-Trigger the **rag** agent when the user asks:
-- “What’s my analysis?”
-- “Give me a summary of my portfolio”
-- “What do I think about my stocks?”
-- “Show commentary”
-
-Action:
-→ Call `rag` directly and return its output.
-Do NOT call price or news.
+supervisor_prompt = build_prompt()
 
----
 
-2. PROFIT / LOSS CALCULATION (rag + price)
-If the user mentions:
-- “profit”, “gain”, “loss”, “P/L”, “return on investment”
+@st.cache_resource
+def get_checkpointer():
+    """One checkpointer per process; each session keeps its own thread in it."""
+    return create_checkpointer()
 
-Step-by-step:
-  a. Call **rag** to retrieve `purchase_price`, `shares`, and `purchase_date`
-  b. Call **price** with today's date ({datetime.date.today()}) to get `current_price`
-  c. Calculate:
-     - `profit = (current_price - purchase_price) × shares`
-     - `percentage = profit / (purchase_price × shares) × 100`
-  d. Reply:
-     "**<TICKER>**: bought on <DATE> at $X × N shares → current $Y → **±Z% / ±$P**" with the calculations explaining how the value is found
- Do NOT guess missing numbers. Skip tickers if data is incomplete.
- 
 
-3. FULL STOCK CHECK (rag + price + news)
+@st.cache_resource
+def get_supervisor(prompt: str):
+    """Compiled once per process (and per prompt) instead of on every rerun."""
+    return build_supervisor(prompt, get_checkpointer())
 
-If the user asks for a full update or opinion on a stock — e.g.,
 
-- “What’s going on with my Apple shares?”
-- “Give me an update on Tesla”
-- “Tell me how my Microsoft holding is doing right now”
-- “Any news and performance for my stocks?”
-
-Step-by-step:
-  a. Call **rag** to get user-owned tickers, number of shares, purchase price/date, and commentary.
-  b. Call **price** to retrieve current stock price and performance trend.
-  c. Call **news** to fetch current sentiment or headlines.
-
-Combine all 3 to give a complete overview:
-
-→ Example format:
-> "**AAPL**: You bought 20 shares at $145.30 on May 10, 2023. Current price is $187.50 (↑29.00%). News sentiment: Positive — headlines suggest strong iPhone 16 demand and AI growth."
-
----
-
-GLOBAL RULES:
-
-- One agent per step. After every call, always hand control back to yourself.
-- Never synthesize financial advice without retrieved evidence.
-- Never guess. If a value is missing, skip or return partial analysis.
-- Do not call more than needed — route precisely.
-
-If the user’s question does not match any rule above, return:
-- “I’m not sure which agent to route this to. Please clarify your question.”
-
-"""
-
-
-supervisor = (
-    create_supervisor(
-        model=ChatOpenAI(model="gpt-4o-mini"),
-        agents=[news, price, rag],
-        prompt=supervisor_prompt,
-        add_handoff_back_messages=True,
-        output_mode="full_history",
-    )
-    .compile(name="portfolio_supervisor")
-)
+supervisor = get_supervisor(supervisor_prompt)
 
 # Chat History Display
 for msg in st.session_state.messages:
@@ -190,15 +176,12 @@ if prompt:
         answer = ""
 
         with st.spinner("Thinking..."):
-            today = datetime.date.today().strftime("%Y-%m-%d")
-            system_msg = {
-                "role": "system",
-                "content": (
-                    f"Today's date is {today}. "
-                    "If the user says 'today', 'now', or 'current', interpret it as this date."
-                ),
-            }
-            for chunk in supervisor.stream({"messages": [system_msg, {"role": "user", "content": prompt}]}):
+            config = st.session_state.thread_config
+            compact_history(supervisor, config)
+
+            # Fixed id so the thread keeps a single, up-to-date date message
+            system_msg = date_context_message()
+            for chunk in supervisor.stream({"messages": [system_msg, {"role": "user", "content": prompt}]}, config):
                 pretty_print_messages(chunk, last_message=True)
 
             final_message_history = chunk["supervisor"]["messages"]
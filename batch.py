@@ -0,0 +1,231 @@
+"""
+Batch entry point for nightly runs: ingests a directory of PDFs (one document per
+worker process), publishes an index per document, then runs a question file
+against each one and writes the answers as JSONL.
+
+    python batch.py statements/ --questions questions.jsonl --out batch_output --workers 4
+
+Each PDF is one client, named after its file stem. Re-running the same command
+resumes: documents already ingested (same size and mtime) and questions already
+answered without error are skipped.
+
+Question file: one question per line (answered by the rag tool), or JSONL objects:
+    {"id": "cost", "question": "What did I pay for AAPL?"}                         rag tool (default)
+    {"id": "trend", "question": "How has NVDA moved this month?", "tool": "price"}  price agent
+    {"id": "value", "tool": "get_portfolio_history"}                               a price tool, optional "args"
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from pathlib import Path
+from preprocessing.summarize_pdf import ingest
+from retrieval.faiss_store import build_snapshot
+from retrieval.index_manager import index_manager
+
+MANIFEST_NAME = "ingested.jsonl"      # one record per ingest attempt, latest per client wins
+RESULTS_NAME  = "results.jsonl"       # one record per answered question
+SUMMARY_NAME  = "run_summary.json"    # throughput of the last run
+SUMMARIES_DIR = "summaries"
+
+
+def read_jsonl(path: Path) -> list[dict]:
+    if not path.exists():
+        return []
+    records = []
+    for line in path.read_text().splitlines():
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError:
+            # Last line cut short by an interruption
+            continue
+    return records
+
+
+def append_jsonl(path: Path, record: dict):
+    with path.open("a") as f:
+        f.write(json.dumps(record, default=str) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def pdf_fingerprint(pdf: Path) -> dict:
+    stat = pdf.stat()
+    return {"size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+
+def ingest_document(pdf_path: str, client_id: str, summary_path: str) -> dict:
+    """Process-pool worker: parses one PDF and publishes its index snapshot."""
+    t0 = time.perf_counter()
+    ingest(pdf_path, summary_path)
+    _, version = build_snapshot(summary_path, index_dir=str(index_manager.index_dir(client_id)))
+    return {"version": version, "seconds": round(time.perf_counter() - t0, 2)}
+
+
+def ingest_all(pdfs: list[Path], out: Path, workers: int, force: bool = False) -> tuple[list[str], dict]:
+    """Ingests the PDFs not already done; returns (clients with an index, stats)."""
+    manifest = out / MANIFEST_NAME
+    latest = {r["client_id"]: r for r in read_jsonl(manifest)}
+    (out / SUMMARIES_DIR).mkdir(parents=True, exist_ok=True)
+
+    ready, todo = [], []
+    for pdf in pdfs:
+        client_id = pdf.stem
+        rec = latest.get(client_id)
+        if (not force and rec and rec["status"] == "ok" and rec["fingerprint"] == pdf_fingerprint(pdf)
+                and index_manager.has_index(client_id)):
+            ready.append(client_id)
+        else:
+            todo.append((pdf, client_id))
+    print(f"📚 {len(pdfs)} PDFs: {len(ready)} already ingested, {len(todo)} to ingest with {workers} workers")
+
+    stats = {"ingested": 0, "failed": 0, "skipped": len(ready), "seconds": 0.0}
+    t0 = time.perf_counter()
+    # spawn: workers start clean instead of forking this process's threads and locks
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    interrupted = True
+    try:
+        futures = {
+            pool.submit(ingest_document, str(pdf), client_id, str(out / SUMMARIES_DIR / f"{client_id}.json")): (pdf, client_id)
+            for pdf, client_id in todo
+        }
+        for n, fut in enumerate(as_completed(futures), 1):
+            pdf, client_id = futures[fut]
+            rec = {"client_id": client_id, "pdf": str(pdf), "fingerprint": pdf_fingerprint(pdf),
+                   "finished_at": time.time()}
+            try:
+                rec.update(status="ok", **fut.result())
+                ready.append(client_id)
+                stats["ingested"] += 1
+            except Exception as e:
+                rec.update(status="failed", error=f"{type(e).__name__}: {e}")
+                stats["failed"] += 1
+            append_jsonl(manifest, rec)
+            print(f"📄 [{n}/{len(todo)}] {client_id}: {rec['status']}"
+                  + (f" ({rec['seconds']}s, {rec['version']})" if rec["status"] == "ok" else f" — {rec['error']}"))
+        interrupted = False
+    finally:
+        # On Ctrl-C or an error, drop queued documents: finished ones are already
+        # in the manifest and the rest are redone on resume
+        pool.shutdown(wait=not interrupted, cancel_futures=interrupted)
+
+    stats["seconds"] = round(time.perf_counter() - t0, 2)
+    stats["docs_per_minute"] = round(stats["ingested"] / stats["seconds"] * 60, 2) if stats["ingested"] else 0.0
+    return ready, stats
+
+
+def load_questions(path: Path) -> list[dict]:
+    questions = []
+    for n, line in enumerate(path.read_text().splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        q = json.loads(line) if line.startswith("{") else {"question": line}
+        q.setdefault("id", f"q{n}")
+        q.setdefault("tool", "rag")
+        questions.append(q)
+    return questions
+
+
+@lru_cache(maxsize=None)
+def _tools() -> dict:
+    # Imported on first use and only the modules used here (not the news agent's pipeline)
+    from agents.portfolio_rag import answer_investment_question
+    from agents.stockpriceagent import price, get_stock_price, get_price_trend, get_price_analytics, get_portfolio_history
+    tools = {t.name: t for t in (get_stock_price, get_price_trend, get_price_analytics, get_portfolio_history)}
+    return {"rag": answer_investment_question, "price": price, **tools}
+
+
+def answer_question(client_id: str, q: dict) -> str:
+    tools = _tools()
+    if q["tool"] not in tools:
+        raise ValueError(f"Unknown tool {q['tool']!r}; use one of {', '.join(tools)}")
+    config = {"configurable": {"client_id": client_id}}
+    if q["tool"] == "rag":
+        return tools["rag"].invoke({"question": q["question"]}, config)
+    if q["tool"] == "price":
+        from supervisor import date_context_message
+        result = tools["price"].invoke(
+            {"messages": [date_context_message(), {"role": "user", "content": q["question"]}]}, config)
+        return result["messages"][-1].content
+    return tools[q["tool"]].invoke(q.get("args", {}), config)
+
+
+def run_questions(clients: list[str], questions: list[dict], out: Path, workers: int) -> dict:
+    """
+    Answers every (client, question) pair not yet answered against the client's
+    current index version; appends to results.jsonl.
+    """
+    results = out / RESULTS_NAME
+    current = {c: index_manager.versions(c)["current"] for c in clients}
+    done = {(r["client_id"], r["question_id"], r.get("index_version"))
+            for r in read_jsonl(results) if not r.get("error")}
+    todo = [(c, q) for c in clients for q in questions if (c, q["id"], current[c]) not in done]
+    print(f"❓ {len(clients)} clients × {len(questions)} questions: {len(todo)} to answer with {workers} threads")
+
+    def run(client_id, q):
+        t0 = time.perf_counter()
+        rec = {"client_id": client_id, "question_id": q["id"], "tool": q["tool"], "question": q.get("question"),
+               "index_version": current[client_id]}
+        try:
+            rec.update(answer=answer_question(client_id, q), error=None)
+        except Exception as e:
+            rec.update(answer=None, error=f"{type(e).__name__}: {e}")
+        rec["seconds"] = round(time.perf_counter() - t0, 2)
+        return rec
+
+    stats = {"answered": 0, "failed": 0, "skipped": len(clients) * len(questions) - len(todo), "seconds": 0.0}
+    t0 = time.perf_counter()
+    # Threads: questions wait on the network; outbound.py rate-limits the backends
+    with ThreadPoolExecutor(workers) as pool:
+        futures = [pool.submit(run, c, q) for c, q in todo]
+        for n, fut in enumerate(as_completed(futures), 1):
+            rec = fut.result()
+            append_jsonl(results, rec)
+            stats["failed" if rec["error"] else "answered"] += 1
+            if rec["error"] or n % 25 == 0 or n == len(todo):
+                print(f"💬 [{n}/{len(todo)}] {rec['client_id']}/{rec['question_id']}"
+                      + (f" — {rec['error']}" if rec["error"] else ""))
+
+    stats["seconds"] = round(time.perf_counter() - t0, 2)
+    stats["questions_per_minute"] = round(stats["answered"] / stats["seconds"] * 60, 2) if stats["answered"] else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk PDF ingestion and offline question answering")
+    parser.add_argument("pdf_dir", type=Path, help="directory of PDFs, one client per file")
+    parser.add_argument("--questions", type=Path, help="question file (text lines or JSONL)")
+    parser.add_argument("--out", type=Path, default=Path("batch_output"))
+    parser.add_argument("--workers", type=int, default=max(1, min(4, (os.cpu_count() or 2) // 2)),
+                        help="ingestion processes (one document each)")
+    parser.add_argument("--qa-workers", type=int, default=8, help="question-answering threads")
+    parser.add_argument("--force", action="store_true", help="re-ingest documents already done")
+    args = parser.parse_args()
+
+    pdfs = sorted(p for p in args.pdf_dir.iterdir() if p.suffix.lower() == ".pdf")
+    if not pdfs:
+        sys.exit(f"No PDFs found in {args.pdf_dir}")
+    args.out.mkdir(parents=True, exist_ok=True)
+
+    clients, ingest_stats = ingest_all(pdfs, args.out, args.workers, args.force)
+    summary = {"ingest": ingest_stats}
+    print(f"📊 Documents: {ingest_stats['ingested']} ingested, {ingest_stats['skipped']} skipped, "
+          f"{ingest_stats['failed']} failed in {ingest_stats['seconds']}s → {ingest_stats['docs_per_minute']} docs/min")
+
+    if args.questions:
+        qa_stats = run_questions(clients, load_questions(args.questions), args.out, args.qa_workers)
+        summary["questions"] = qa_stats
+        print(f"📊 Questions: {qa_stats['answered']} answered, {qa_stats['skipped']} skipped, "
+              f"{qa_stats['failed']} failed in {qa_stats['seconds']}s → {qa_stats['questions_per_minute']} questions/min")
+
+    (args.out / SUMMARY_NAME).write_text(json.dumps(summary, indent=2))
+    print(f"✅ Results in {args.out / RESULTS_NAME}")
+
+
+if __name__ == "__main__":
+    main()
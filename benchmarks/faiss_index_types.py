@@ -0,0 +1,87 @@
+"""
+Compares the FAISS index types from retrieval/index_types.py on a synthetic corpus.
+Reports recall@k against exact search, per-query latency and index memory.
+
+    python benchmarks/faiss_index_types.py --n 50000 --dim 1536 --k 10
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import argparse
+import time
+import faiss
+import numpy as np
+from retrieval.index_types import INDEX_TYPES, make_index, index_memory_bytes
+
+
+def synthetic_corpus(n: int, dim: int, n_queries: int, n_topics: int = 200, seed: int = 0):
+    """
+    Clustered, L2-normalised vectors (like sentence embeddings): each document is
+    a noisy copy of one of `n_topics` centres; queries are noisy copies of documents.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((n_topics, dim)).astype("float32")
+    docs = centres[rng.integers(0, n_topics, n)] + 0.5 * rng.standard_normal((n, dim)).astype("float32")
+    queries = docs[rng.integers(0, n, n_queries)] + 0.3 * rng.standard_normal((n_queries, dim)).astype("float32")
+    docs /= np.linalg.norm(docs, axis=1, keepdims=True)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return docs, queries
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def bench(index_type: str, docs: np.ndarray, queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    t0 = time.perf_counter()
+    index = make_index(index_type, docs)
+    index.add(docs)
+    build_s = time.perf_counter() - t0
+
+    # One query at a time, as the retriever issues them
+    latencies, found = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        _, I = index.search(q.reshape(1, -1), k)
+        latencies.append(time.perf_counter() - t0)
+        found.append(I[0])
+
+    lat_ms = np.array(latencies) * 1000
+    return {
+        "index": index_type,
+        "recall": recall_at_k(np.array(found), truth),
+        "p50_ms": float(np.percentile(lat_ms, 50)),
+        "p95_ms": float(np.percentile(lat_ms, 95)),
+        "mem_mb": index_memory_bytes(index) / 1e6,
+        "build_s": build_s,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=20000, help="corpus size")
+    parser.add_argument("--dim", type=int, default=1536, help="embedding dimension")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(1)  # comparable single-thread latencies
+    docs, queries = synthetic_corpus(args.n, args.dim, args.queries)
+
+    exact = faiss.IndexFlatL2(args.dim)
+    exact.add(docs)
+    _, truth = exact.search(queries, args.k)
+
+    print(f"n={args.n} dim={args.dim} queries={args.queries} k={args.k}\n")
+    print(f"{'index':<6} {f'recall@{args.k}':>10} {'p50 ms':>8} {'p95 ms':>8} {'mem MB':>9} {'build s':>8}")
+    for index_type in args.types:
+        r = bench(index_type, docs, queries, truth, args.k)
+        print(f"{r['index']:<6} {r['recall']:>10.3f} {r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f} "
+              f"{r['mem_mb']:>9.1f} {r['build_s']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Drives the outbound policy (outbound.py) against local fault-injecting stubs.
+No network: a stub backend fails with 429 / 503 / connection errors at a
+configurable rate and with an optional outage window. The retry, breaker and
+singleflight behaviour itself is asserted in tests/test_outbound.py.
+
+    python benchmarks/outbound_faults.py --calls 200 --threads 16 --error-rate 0.3
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from outbound import OutboundPolicy, CircuitOpenError
+
+
+class StubError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"stub HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FaultyBackend:
+    """Counts real requests; fails at `error_rate`, and always during [outage_start, outage_end)."""
+
+    def __init__(self, error_rate: float, latency: float, outage=(None, None), seed: int = 0):
+        self.error_rate = error_rate
+        self.latency = latency
+        self.outage = outage
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.t0 = time.monotonic()
+
+    def __call__(self, query: str) -> str:
+        with self.lock:
+            self.requests += 1
+            roll = self.rng.random()
+        time.sleep(self.latency)
+        start, end = self.outage
+        if start is not None and start <= time.monotonic() - self.t0 < end:
+            raise StubError(503)
+        if roll < self.error_rate:
+            raise self.rng.choice([StubError(429), StubError(503), ConnectionError("stub reset")])
+        return f"ok:{query}"
+
+
+def run_policy(args):
+    backend = FaultyBackend(args.error_rate, args.latency, (args.outage_start, args.outage_end))
+    pol = OutboundPolicy("stub", rate=args.rate, burst=args.burst, concurrency=8,
+                         max_retries=4, base_delay=0.05, max_delay=0.5,
+                         breaker_threshold=5, breaker_reset=0.5)
+    # Few distinct queries so concurrent duplicates get coalesced
+    queries = [f"q{i % args.distinct}" for i in range(args.calls)]
+    outcomes = {"ok": 0, "failed": 0, "circuit_open": 0}
+
+    def one(q):
+        try:
+            pol.call(backend, q, key=q)
+            return "ok"
+        except CircuitOpenError:
+            return "circuit_open"
+        except Exception:
+            return "failed"
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as pool:
+        for outcome in pool.map(one, queries):
+            outcomes[outcome] += 1
+    elapsed = time.perf_counter() - t0
+
+    print(f"🧪 policy: {args.calls} calls in {elapsed:.2f}s, {backend.requests} reached the backend")
+    print(f"   outcomes: {outcomes}")
+    print(f"   metrics:  {pol.snapshot()}")
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--calls", type=int, default=200)
+    p.add_argument("--threads", type=int, default=16)
+    p.add_argument("--distinct", type=int, default=20)
+    p.add_argument("--error-rate", type=float, default=0.3)
+    p.add_argument("--latency", type=float, default=0.02)
+    p.add_argument("--rate", type=float, default=100.0)
+    p.add_argument("--burst", type=int, default=20)
+    p.add_argument("--outage-start", type=float, default=None, help="seconds after start")
+    p.add_argument("--outage-end", type=float, default=None)
+    args = p.parse_args()
+    run_policy(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,476 @@
+"""
+Shared policy for every outbound call (OpenAI, yfinance, Yahoo news, Ollama).
+
+Each backend gets one OutboundPolicy with:
+  - a token bucket (requests / second with a burst allowance),
+  - a cap on concurrent in-flight calls,
+  - retries with full-jitter exponential backoff (honouring Retry-After),
+  - a circuit breaker that fails fast while the backend is down,
+  - singleflight: identical in-flight calls (same key) share one request,
+  - counters exposed through metrics().
+
+Clock, sleep and randomness are injectable so the policy can be driven
+deterministically against local fault-injecting stubs.
+"""
+import time
+import random
+import asyncio
+import hashlib
+import threading
+import weakref
+from concurrent.futures import Future, CancelledError as FutureCancelled
+from functools import lru_cache
+import httpx
+
+RETRY_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+# backend -> rate (req/s), burst, max concurrent calls, max retries, breaker threshold / reset seconds
+POLICY_DEFAULTS = {
+    "openai":            {"rate": 8.0,  "burst": 16, "concurrency": 8, "max_retries": 4},
+    "openai-embeddings": {"rate": 20.0, "burst": 40, "concurrency": 8, "max_retries": 4},
+    "yfinance":          {"rate": 2.0,  "burst": 5,  "concurrency": 4, "max_retries": 3},
+    "yahoo-news":        {"rate": 2.0,  "burst": 5,  "concurrency": 4, "max_retries": 3},
+    "ollama":            {"rate": 4.0,  "burst": 4,  "concurrency": 2, "max_retries": 2},
+}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the backend while its circuit breaker is open."""
+
+
+class RetryableStatus(Exception):
+    """An HTTP response whose status is worth retrying (429 / 5xx)."""
+
+    def __init__(self, status_code: int, retry_after: float | None = None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def _status_of(exc: Exception) -> int | None:
+    status = getattr(exc, "status_code", None)
+    if status is None and getattr(exc, "response", None) is not None:
+        status = getattr(exc.response, "status_code", None)
+    return status
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Rate limits, server errors, timeouts and connection failures are retried."""
+    if isinstance(exc, CircuitOpenError):
+        return False
+    status = _status_of(exc)
+    if status is not None:
+        return status in RETRY_STATUSES
+    if isinstance(exc, (ConnectionError, TimeoutError, httpx.TransportError)):
+        return True
+    name = type(exc).__name__
+    return any(s in name for s in ("RateLimit", "Timeout", "Connection"))
+
+
+def _retry_after(exc: Exception) -> float | None:
+    if getattr(exc, "retry_after", None) is not None:
+        return exc.retry_after
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Thread-safe token bucket; reserve() hands out the wait before a token is available."""
+
+    def __init__(self, rate: float, burst: int, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.clock = clock
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Tokens may go negative: each caller queues behind earlier reservations
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class CircuitBreaker:
+    """closed → open after `threshold` consecutive failures → half-open after `reset_seconds`."""
+
+    def __init__(self, threshold: int = 5, reset_seconds: float = 30.0, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self.clock() - self.opened_at >= self.reset_seconds else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.trial_in_flight:
+                self.trial_in_flight = True   # let exactly one probe through
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_in_flight or self.failures >= self.threshold:
+                self.opened_at = self.clock()
+            self.trial_in_flight = False
+
+    def abandon(self):
+        """An attempt was cancelled: a half-open probe counts as failed, otherwise nothing is recorded."""
+        with self._lock:
+            if self.trial_in_flight:
+                self.opened_at = self.clock()
+                self.trial_in_flight = False
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share the first caller's result."""
+
+    def __init__(self):
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def join(self, key) -> tuple[Future, bool]:
+        """(future, is_leader); the leader must resolve the future and call done(key)."""
+        with self._lock:
+            fut = self._inflight.get(key)
+            if fut is not None:
+                return fut, False
+            fut = Future()
+            self._inflight[key] = fut
+            return fut, True
+
+    def done(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+
+class OutboundPolicy:
+    def __init__(self, name: str, rate: float, burst: int, concurrency: int,
+                 max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 20.0,
+                 breaker_threshold: int = 5, breaker_reset: float = 30.0,
+                 clock=time.monotonic, sleep=time.sleep, rng=random.random):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst, clock)
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset, clock)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.rng = rng
+        self.concurrency = concurrency
+        self._slots = threading.BoundedSemaphore(concurrency)
+        # Async callers wait on an asyncio.Semaphore; one per event loop since they are loop-bound
+        self._async_slots = weakref.WeakKeyDictionary()
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self.stats = {
+            "calls": 0, "attempts": 0, "successes": 0, "failures": 0, "retries": 0,
+            "coalesced": 0, "circuit_rejections": 0, "throttle_wait_seconds": 0.0,
+            "in_flight": 0,
+        }
+
+    def _count(self, key: str, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def backoff(self, attempt: int, exc: Exception) -> float:
+        """Full-jitter exponential backoff, or the server's Retry-After when longer."""
+        delay = self.rng() * min(self.max_delay, self.base_delay * 2 ** attempt)
+        retry_after = _retry_after(exc)
+        return max(delay, min(retry_after, self.max_delay)) if retry_after else delay
+
+    def _before_attempt(self) -> float:
+        if not self.breaker.allow():
+            self._count("circuit_rejections")
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        wait = self.bucket.reserve()
+        self._count("throttle_wait_seconds", wait)
+        self._count("attempts")
+        return wait
+
+    def _after_failure(self, exc: Exception, attempt: int) -> float | None:
+        """Records a failed attempt; returns the backoff delay, or None to give up."""
+        retryable = is_retryable(exc)
+        if retryable:
+            self.breaker.record_failure()
+        else:
+            # The backend answered (e.g. 400): it is up, so don't hold the half-open probe
+            self.breaker.record_success()
+        if not retryable or attempt >= self.max_retries:
+            self._count("failures")
+            return None
+        self._count("retries")
+        return self.backoff(attempt, exc)
+
+    def _slots_for_loop(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if loop not in self._async_slots:
+                self._async_slots[loop] = asyncio.Semaphore(self.concurrency)
+            return self._async_slots[loop]
+
+    def _run(self, fn, args, kwargs):
+        for attempt in range(self.max_retries + 1):
+            wait = self._before_attempt()
+            try:
+                self.sleep(wait)
+                with self._slots:
+                    self._count("in_flight")
+                    try:
+                        result = fn(*args, **kwargs)
+                    finally:
+                        self._count("in_flight", -1)
+            except Exception as e:
+                delay = self._after_failure(e, attempt)
+                if delay is None:
+                    raise
+            except BaseException:
+                # Interrupted mid-attempt: release a half-open probe so the circuit can recover
+                self.breaker.abandon()
+                raise
+            else:
+                self.breaker.record_success()
+                self._count("successes")
+                return result
+            self.sleep(delay)
+
+    async def _arun(self, fn, args, kwargs):
+        for attempt in range(self.max_retries + 1):
+            wait = self._before_attempt()
+            try:
+                await asyncio.sleep(wait)
+                async with self._slots_for_loop():
+                    self._count("in_flight")
+                    try:
+                        result = await fn(*args, **kwargs)
+                    finally:
+                        self._count("in_flight", -1)
+            except Exception as e:
+                delay = self._after_failure(e, attempt)
+                if delay is None:
+                    raise
+            except BaseException:
+                # Cancelled (e.g. by a request timeout): release a half-open probe
+                self.breaker.abandon()
+                raise
+            else:
+                self.breaker.record_success()
+                self._count("successes")
+                return result
+            await asyncio.sleep(delay)
+
+    def _settle(self, flight_key, fut: Future, result=None, exc: BaseException | None = None):
+        """
+        Resolves the leader's shared future. A cancelled or interrupted leader
+        cancels it instead, and the followers then retry the call themselves.
+        """
+        self._flight.done(flight_key)
+        if exc is None:
+            fut.set_result(result)
+        elif isinstance(exc, Exception):
+            fut.set_exception(exc)
+        else:
+            fut.cancel()
+
+    def call(self, fn, *args, key=None, **kwargs):
+        """
+        Runs fn(*args, **kwargs) under this policy.
+        Calls passing the same `key` while one is in flight wait for and share its result.
+        """
+        self._count("calls")
+        if key is None:
+            return self._run(fn, args, kwargs)
+        flight_key = (self.name, key)
+        while True:
+            fut, leader = self._flight.join(flight_key)
+            if leader:
+                break
+            self._count("coalesced")
+            try:
+                return fut.result()
+            except FutureCancelled:
+                continue
+        try:
+            result = self._run(fn, args, kwargs)
+        except BaseException as e:
+            self._settle(flight_key, fut, exc=e)
+            raise
+        self._settle(flight_key, fut, result)
+        return result
+
+    async def acall(self, fn, *args, key=None, **kwargs):
+        """Async variant of call(); `fn` is a coroutine function."""
+        self._count("calls")
+        if key is None:
+            return await self._arun(fn, args, kwargs)
+        flight_key = (self.name, key)
+        while True:
+            fut, leader = self._flight.join(flight_key)
+            if leader:
+                break
+            self._count("coalesced")
+            try:
+                # shield: a follower's own cancellation must not cancel the shared future
+                return await asyncio.shield(asyncio.wrap_future(fut))
+            except (asyncio.CancelledError, FutureCancelled):
+                if not fut.cancelled():
+                    raise
+        try:
+            result = await self._arun(fn, args, kwargs)
+        except BaseException as e:
+            self._settle(flight_key, fut, exc=e)
+            raise
+        self._settle(flight_key, fut, result)
+        return result
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self.stats, "circuit": self.breaker.state}
+
+
+_policies = {}
+_policies_lock = threading.Lock()
+
+
+def policy(backend: str) -> OutboundPolicy:
+    """The process-wide policy for `backend` (see POLICY_DEFAULTS)."""
+    with _policies_lock:
+        if backend not in _policies:
+            _policies[backend] = OutboundPolicy(backend, **POLICY_DEFAULTS.get(backend, POLICY_DEFAULTS["openai"]))
+        return _policies[backend]
+
+
+def metrics() -> dict:
+    """Counters and circuit state of every backend used so far."""
+    with _policies_lock:
+        names = list(_policies)
+    return {name: _policies[name].snapshot() for name in names}
+
+
+# ── HTTP transports: apply a policy to every request an SDK client sends ───────
+
+def _request_key(request: httpx.Request) -> str:
+    body = request.content
+    return hashlib.sha256(request.method.encode() + str(request.url).encode() + body).hexdigest()
+
+
+def _is_stream(request: httpx.Request) -> bool:
+    return b'"stream":true' in request.content.replace(b" ", b"")
+
+
+# The body is passed on already decoded, so these no longer describe it
+_BODY_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+def _decoded_headers(response: httpx.Response) -> list[tuple[str, str]]:
+    return [(k, v) for k, v in response.headers.multi_items() if k.lower() not in _BODY_HEADERS]
+
+
+def _raise_for_retry(response: httpx.Response):
+    if response.status_code in RETRY_STATUSES:
+        try:
+            retry_after = float(response.headers.get("retry-after"))
+        except (TypeError, ValueError):
+            retry_after = None
+        raise RetryableStatus(response.status_code, retry_after)
+
+
+class PolicyTransport(httpx.BaseTransport):
+    """
+    httpx transport that sends each request under an OutboundPolicy.
+    Identical non-streaming requests in flight are coalesced; streaming
+    responses are passed through unbuffered and never coalesced.
+    """
+
+    def __init__(self, backend: str, transport: httpx.BaseTransport | None = None):
+        self.policy = policy(backend)
+        self._inner = transport or httpx.HTTPTransport()
+
+    def _send(self, request):
+        response = self._inner.handle_request(request)
+        response.read()
+        _raise_for_retry(response)
+        return response.status_code, _decoded_headers(response), response.content
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        if _is_stream(request):
+            return self.policy.call(self._inner.handle_request, request)
+        try:
+            status, headers, content = self.policy.call(self._send, request, key=_request_key(request))
+        except RetryableStatus as e:
+            # Retries exhausted: hand the SDK an equivalent response so it raises its own error
+            return httpx.Response(e.status_code, request=request)
+        return httpx.Response(status, headers=headers, content=content, request=request)
+
+    def close(self):
+        self._inner.close()
+
+
+class AsyncPolicyTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of PolicyTransport, sharing the same per-backend policy."""
+
+    def __init__(self, backend: str, transport: httpx.AsyncBaseTransport | None = None):
+        self.policy = policy(backend)
+        self._inner = transport or httpx.AsyncHTTPTransport()
+
+    async def _send(self, request):
+        response = await self._inner.handle_async_request(request)
+        await response.aread()
+        _raise_for_retry(response)
+        return response.status_code, _decoded_headers(response), response.content
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        if _is_stream(request):
+            return await self.policy.acall(self._inner.handle_async_request, request)
+        try:
+            status, headers, content = await self.policy.acall(self._send, request, key=_request_key(request))
+        except RetryableStatus as e:
+            return httpx.Response(e.status_code, request=request)
+        return httpx.Response(status, headers=headers, content=content, request=request)
+
+    async def aclose(self):
+        await self._inner.aclose()
+
+
+@lru_cache(maxsize=None)
+def _http_clients(backend: str):
+    timeout = httpx.Timeout(60.0, connect=10.0)
+    return (httpx.Client(transport=PolicyTransport(backend), timeout=timeout),
+            httpx.AsyncClient(transport=AsyncPolicyTransport(backend), timeout=timeout))
+
+
+def openai_client_kwargs(backend: str = "openai") -> dict:
+    """
+    Keyword arguments for ChatOpenAI / OpenAIEmbeddings routing their HTTP traffic
+    through the `backend` policy. The SDK's own retries are disabled so retries,
+    backoff and circuit breaking happen in one place.
+    """
+    client, async_client = _http_clients(backend)
+    return {"http_client": client, "http_async_client": async_client, "max_retries": 0}
@@ -0,0 +1,174 @@
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import traceback
+from contextlib import contextmanager
+from preprocessing.summarize_pdf import ingest, INGEST_STAGES
+from retrieval.index_manager import index_manager
+
+JOBS_DB = "ingest_jobs.db"
+INGEST_WORKERS = 2
+POLL_SECONDS = 1.0
+# All stages a job goes through; "embed" builds the client's index from the summaries
+JOB_STAGES = (*INGEST_STAGES, "embed")
+# Rough share of a job's wall time spent in each stage, for the overall progress bar
+STAGE_WEIGHTS = {"markdown": 0.05, "partition": 0.45, "tables": 0.2, "charts": 0.2, "embed": 0.1}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           TEXT PRIMARY KEY,
+    client_id    TEXT NOT NULL,
+    pdf_path     TEXT NOT NULL,
+    summary_path TEXT NOT NULL,
+    status       TEXT NOT NULL,          -- queued | running | done | failed
+    stage        TEXT,
+    progress     TEXT NOT NULL DEFAULT '{}',   -- {stage: [done, total]}
+    error        TEXT,
+    created_at   REAL NOT NULL,
+    updated_at   REAL NOT NULL
+)
+"""
+
+
+def job_progress(job: dict) -> float:
+    """Overall completion of a job in [0, 1], weighting each stage by STAGE_WEIGHTS."""
+    if job["status"] == "done":
+        return 1.0
+    total = 0.0
+    for stage, (done, count) in job["progress"].items():
+        total += STAGE_WEIGHTS.get(stage, 0.0) * (done / count if count else 1.0)
+    return min(total, 1.0)
+
+
+class JobQueue:
+    """
+    Persistent ingest queue in SQLite, drained by a pool of background worker threads.
+    Each job ingests one PDF and rebuilds its client's index; the client's previous
+    index keeps serving queries until the new one is swapped in.
+    Jobs left running by a crashed process are re-queued on start().
+    """
+
+    def __init__(self, db_path: str = JOBS_DB, workers: int = INGEST_WORKERS):
+        self.db_path = db_path
+        self.workers = workers
+        self._stop = threading.Event()
+        self._threads = []
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per call keeps sqlite usage thread-safe
+        db = sqlite3.connect(self.db_path, timeout=30)
+        db.row_factory = sqlite3.Row
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def submit(self, client_id: str, pdf_path: str, summary_path: str) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, client_id, pdf_path, summary_path, status, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, client_id, pdf_path, summary_path, now, now),
+            )
+        return job_id
+
+    def get(self, job_id: str) -> dict | None:
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def jobs_for(self, client_id: str, limit: int = 10) -> list[dict]:
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT * FROM jobs WHERE client_id = ? ORDER BY created_at DESC LIMIT ?",
+                (client_id, limit),
+            ).fetchall()
+        return [self._to_dict(r) for r in rows]
+
+    @staticmethod
+    def _to_dict(row) -> dict:
+        job = dict(row)
+        job["progress"] = json.loads(job["progress"])
+        return job
+
+    def _claim(self) -> dict | None:
+        """
+        Atomically moves the oldest queued job to running.
+        Jobs of a client that already has one running wait, so a client's index
+        is only ever rebuilt by one worker at a time.
+        """
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' AND client_id NOT IN"
+                " (SELECT client_id FROM jobs WHERE status = 'running')"
+                " ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?",
+                (time.time(), row["id"]),
+            )
+        return self._to_dict(row)
+
+    def _update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        if "progress" in fields:
+            fields["progress"] = json.dumps(fields["progress"])
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._connect() as db:
+            db.execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+
+    def _run(self, job: dict):
+        job_id = job["id"]
+        progress = {}
+
+        def report(stage, done, total):
+            progress[stage] = [done, total]
+            self._update(job_id, stage=stage, progress=progress)
+
+        print(f"⚙️  Ingest job {job_id} started: {job['pdf_path']}")
+        try:
+            ingest(job["pdf_path"], job["summary_path"], progress=report)
+            report("embed", 0, 1)
+            index_manager.build(job["client_id"], job["summary_path"])
+            report("embed", 1, 1)
+            self._update(job_id, status="done")
+            print(f"✅ Ingest job {job_id} done")
+        except Exception as e:
+            traceback.print_exc()
+            self._update(job_id, status="failed", error=str(e))
+
+    def _worker(self):
+        while not self._stop.is_set():
+            job = self._claim()
+            if job is None:
+                self._stop.wait(POLL_SECONDS)
+                continue
+            self._run(job)
+
+    def start(self):
+        """Re-queues interrupted jobs and starts the worker threads."""
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"ingest-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self, timeout: float | None = None):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads.clear()
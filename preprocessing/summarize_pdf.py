@@ -1,13 +1,52 @@
+import io
 import json
 import re
+import base64
+import hashlib
 import requests
 from pathlib import Path
+from PIL import Image, ImageStat
 from unstructured.partition.pdf import partition_pdf
 import pymupdf4llm
 from langchain.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
+from outbound import openai_client_kwargs, policy
+from preprocessing.table_parser import parse_purchase_table, table_fingerprint
+
+PURCHASE_KEYS = ("ticker", "purchase_date", "price", "shares")
+OLLAMA_URL = "http://localhost:11434/api/generate"
+
+def format_purchase_bullets(rows: list[dict]) -> list[str]:
+    return [
+        f"- {r['ticker']}: {r['shares']} shares @ {r['price']} (bought {r['purchase_date']})"
+        for r in rows
+    ]
+
+def extract_rows_from_table(content: str) -> list[dict]:
+    """
+    Purchase rows for a table: parsed locally when the columns can be mapped,
+    otherwise extracted by the Ollama model.
+    """
+    rows = parse_purchase_table(content)
+    if rows is not None:
+        print(f"📐 Parsed table locally: {len(rows)} rows")
+        return rows
+    return extract_rows_with_llm(content)
 
 def extract_bullets_from_table(content: str) -> list[str]:
+    return format_purchase_bullets(extract_rows_from_table(content))
+
+def _ollama_generate(prompt: str) -> dict:
+    res = requests.post(OLLAMA_URL, json={
+        "model": "gemma:2b-instruct",
+        "prompt": prompt,
+        "stream": False
+    }, timeout=120)
+    # 429 / 5xx raise here so the outbound policy retries them
+    res.raise_for_status()
+    return res.json()
+
+def extract_rows_with_llm(content: str) -> list[dict]:
     prompt = f"""
         You are a data extractor.
 
@@ -23,21 +62,14 @@ def extract_bullets_from_table(content: str) -> list[str]:
         {content}
             """
     try:
-        res = requests.post("http://localhost:11434/api/generate", json={
-            "model": "gemma:2b-instruct",
-            "prompt": prompt,
-            "stream": False
-        })
-        raw = res.json()["response"].strip()
+        res = policy("ollama").call(_ollama_generate, prompt, key=("generate", prompt))
+        raw = res["response"].strip()
 
         match = re.search(r'```json\s*(.*?)\s*```', raw, re.DOTALL)
         json_str = match.group(1) if match else raw
 
         rows = json.loads(json_str)          
-        return [
-            f"- {r['ticker']}: {r['shares']} shares @ {r['price']} (bought {r['purchase_date']})"
-            for r in rows
-        ]
+        return [r for r in rows if all(k in r for k in PURCHASE_KEYS)]
     except Exception as e:
         print("LLM extraction failed:", e)
         return []
@@ -73,6 +105,21 @@ def extract_image_chunks(pdf_path: str):
         languages=["eng"]
     )
 
+def dedupe_tables(tables: list[tuple[str, str]]) -> list[dict]:
+    """
+    Groups (source, raw) tables by normalized content, so a table found by both
+    the markdown and the unstructured extractor is processed once.
+    The first raw text seen is kept (markdown first: its pipe layout parses locally).
+    """
+    distinct = {}
+    for source, raw in tables:
+        fp = table_fingerprint(raw)
+        if fp not in distinct:
+            distinct[fp] = {"fingerprint": fp, "raw": raw, "sources": [source]}
+        elif source not in distinct[fp]["sources"]:
+            distinct[fp]["sources"].append(source)
+    return list(distinct.values())
+
 def get_images_base64(chunks):
     images_b64 = []
     for chunk in chunks:
@@ -82,12 +129,107 @@ def get_images_base64(chunks):
                     images_b64.append(el.metadata.image_base64)
     return images_b64
 
+# Image pre-stage before vision calls
+MAX_IMAGE_SIDE = 1024       # longest side sent to the vision model (px)
+MIN_IMAGE_SIDE = 64         # smaller images are icons / bullets
+MAX_ASPECT_RATIO = 8.0      # thinner images are rules, banners and borders
+MIN_PIXEL_STDDEV = 8.0      # near-uniform images carry no chart data
+DUPLICATE_KEY_SIDE = 64     # greyscale thumbnail compared exactly to find duplicates
+NEAR_DUPLICATE_DISTANCE = 3 # 16x16 dHash bits; near-duplicates are counted, never dropped
+
+def pixel_key(img: Image.Image) -> str:
+    """
+    Digest of a 64x64, 8-level greyscale thumbnail: equal for re-encodings of the
+    same image, but different for charts that differ in bar heights or labels.
+    """
+    small = img.convert("L").resize((DUPLICATE_KEY_SIDE, DUPLICATE_KEY_SIDE), Image.Resampling.LANCZOS)
+    return hashlib.sha1(bytes(p >> 5 for p in small.getdata())).hexdigest()
+
+def dhash(img: Image.Image, size: int = 16) -> int:
+    """256-bit difference hash: robust to rescaling and recompression."""
+    small = img.convert("L").resize((size + 1, size), Image.Resampling.LANCZOS)
+    px = list(small.getdata())
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = px[row * (size + 1) + col]
+            right = px[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+def is_decorative(img: Image.Image) -> bool:
+    w, h = img.size
+    if min(w, h) < MIN_IMAGE_SIDE:
+        return True
+    if max(w, h) / min(w, h) > MAX_ASPECT_RATIO:
+        return True
+    return max(ImageStat.Stat(img.convert("L")).stddev) < MIN_PIXEL_STDDEV
+
+def prepare_chart_images(images_b64: list[str]):
+    """
+    Drops duplicate (same normalized pixels) and tiny / decorative images, and downsizes
+    the rest to MAX_IMAGE_SIDE, re-encoded as the smaller of JPEG and PNG, before
+    they are sent to the vision model.
+    Charts drawn from one template often differ only in values or labels, so
+    near-duplicates (close perceptual hash) are kept and only counted.
+    Returns (images_b64, stats).
+    """
+    kept, keys, hashes = [], set(), []
+    stats = {"images": len(images_b64), "duplicates": 0, "near_duplicates": 0, "decorative": 0,
+             "unreadable": 0, "bytes_in": 0, "bytes_out": 0}
+
+    for b64 in images_b64:
+        try:
+            img = Image.open(io.BytesIO(base64.b64decode(b64)))
+            img.load()
+        except Exception:
+            stats["unreadable"] += 1
+            continue
+        stats["bytes_in"] += len(b64)
+
+        if is_decorative(img):
+            stats["decorative"] += 1
+            continue
+        key = pixel_key(img)
+        if key in keys:
+            stats["duplicates"] += 1
+            continue
+        keys.add(key)
+        h = dhash(img)
+        if any(bin(h ^ other).count("1") <= NEAR_DUPLICATE_DISTANCE for other in hashes):
+            stats["near_duplicates"] += 1
+        hashes.append(h)
+
+        orig_size = img.size
+        img = img.convert("RGB")
+        img.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE), Image.Resampling.LANCZOS)
+        # Flat-colour charts are often smaller as PNG than JPEG; keep the smaller
+        encoded = []
+        for fmt, opts in (("JPEG", {"quality": 85, "optimize": True}), ("PNG", {"optimize": True})):
+            buf = io.BytesIO()
+            img.save(buf, format=fmt, **opts)
+            encoded.append(base64.b64encode(buf.getvalue()).decode())
+        out = min(encoded, key=len)
+        # Keep the original if it was not resized and re-encoding did not help
+        if img.size == orig_size and len(out) >= len(b64):
+            out = b64
+        stats["bytes_out"] += len(out)
+        kept.append(out)
+
+    stats["vision_calls_saved"] = stats["images"] - len(kept)
+    stats["bytes_saved"] = stats["bytes_in"] - stats["bytes_out"]
+    return kept, stats
+
+def image_mime(image_b64: str) -> str:
+    # PNG files start with \x89PNG, which base64-encodes to "iVBOR"
+    return "image/png" if image_b64.startswith("iVBOR") else "image/jpeg"
+
 def analyze_chart_image_openai(image_b64):
-    vision_model = ChatOpenAI(model="gpt-4o-mini")
+    vision_model = ChatOpenAI(model="gpt-4o-mini", **openai_client_kwargs())
     messages = [
         ("user", [
             {"type": "text", "text": "Extract tickers, purchase date, price and shares from this chart as JSON."},
-            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_b64}"}}
+            {"type": "image_url", "image_url": {"url": f"data:{image_mime(image_b64)};base64,{image_b64}"}}
         ])
     ]
     prompt = ChatPromptTemplate.from_messages(messages)
@@ -101,45 +243,74 @@ def analyze_chart_image_openai(image_b64):
     except:
         return []
 
-def ingest(pdf_path, output_path="summaries.json"):
+# Ingest stages, in order, as reported to the `progress` callback
+INGEST_STAGES = ("markdown", "partition", "tables", "charts")
+
+def ingest(pdf_path, output_path="summaries.json", progress=None):
+    """
+    Parses `pdf_path` into summaries saved at `output_path`.
+    `progress(stage, done, total)` is called as each stage in INGEST_STAGES advances.
+    """
+    report = progress or (lambda stage, done, total: None)
     all_summaries = []
 
     # Extract markdown tables
+    report("markdown", 0, 1)
     md = extract_markdown(pdf_path)
     md_tables = extract_all_markdown_tables(md)
     print(f"🔍 Markdown tables found: {len(md_tables)}")
-
-    for md_table in md_tables:
-        bullets = extract_bullets_from_table(md_table)
-        if bullets:
-            for b in bullets:
-                all_summaries.append({
-                    "source": "markdown",
-                    "type": "purchase_entry",
-                    "summary": b,        
-                    "raw": md_table
-                })
+    report("markdown", 1, 1)
 
     # Extract structured text/tables/images
+    report("partition", 0, 1)
     chunks = extract_image_chunks(pdf_path)
+    report("partition", 1, 1)
+
+    # Tables from both extractors, each distinct table extracted (and later embedded) once
+    pdf_tables = [chunk.text for chunk in chunks if chunk.category == "Table"]
+    tables = dedupe_tables([("markdown", t) for t in md_tables] + [("pdf", t) for t in pdf_tables])
+    print(f"🔍 Tables: {len(md_tables)} markdown + {len(pdf_tables)} pdf → {len(tables)} distinct")
+    report("tables", 0, len(tables))
+
+    for n, table in enumerate(tables, 1):
+        rows = extract_rows_from_table(table["raw"])
+        bullets = format_purchase_bullets(rows)
+        for b in bullets:
+            all_summaries.append({
+                "source": table["sources"][0],
+                "sources": table["sources"],
+                "type": "purchase_entry",
+                "summary": b,        
+                "raw": table["raw"]
+            })
+        all_summaries.append({"source": table["sources"][0],
+                              "sources": table["sources"],
+                              "fingerprint": table["fingerprint"],
+                              "type": "table",
+                              "summary": "\n".join(bullets) or table["raw"],
+                              "rows": rows,
+                              "raw": table["raw"]})
+        report("tables", n, len(tables))
+
     for chunk in chunks:
-        if chunk.category == "Table":
-            summary = extract_bullets_from_table(chunk.text)
-            all_summaries.append({"source": "pdf", 
-                                  "type": "table", 
-                                  "summary": summary, 
-                                  "raw": chunk.text})
-        elif chunk.category in {"NarrativeText", "CompositeElement"}:
+        if chunk.category in {"NarrativeText", "CompositeElement"}:
             all_summaries.append({"source": "pdf", 
                                   "type": "text", 
                                   "raw": chunk.text})
 
     # Extract chart images and analyze
-    chart_images = get_images_base64(chunks)
-    for img in chart_images:
+    chart_images, img_stats = prepare_chart_images(get_images_base64(chunks))
+    print(f"🖼️  Images: {img_stats['images']} found, {len(chart_images)} sent to vision "
+          f"({img_stats['duplicates']} duplicate, {img_stats['decorative']} decorative, "
+          f"{img_stats['unreadable']} unreadable; {img_stats['near_duplicates']} near-duplicates kept) — "
+          f"{img_stats['vision_calls_saved']} vision calls and "
+          f"{img_stats['bytes_saved'] / 1024:.0f} KB of image data saved")
+    report("charts", 0, len(chart_images))
+    for n, img in enumerate(chart_images, 1):
         result = analyze_chart_image_openai(img)
         if result:
             all_summaries.append({"source": "image", "type": "chart", "extracted": result})
+        report("charts", n, len(chart_images))
 
     Path(output_path).write_text(json.dumps(all_summaries, indent=2))
     print(f"✅ Saved summaries to {output_path}")
@@ -0,0 +1,156 @@
+import re
+import hashlib
+import datetime
+
+# Header synonyms per output field, most specific first.
+# Headers are matched after lower-casing and stripping punctuation.
+HEADER_SYNONYMS = {
+    "ticker": ["ticker symbol", "ticker", "symbol", "stock symbol", "stock", "security",
+               "instrument", "holding", "company", "name"],
+    "purchase_date": ["purchase date", "date purchased", "buy date", "trade date", "acquisition date",
+                      "date acquired", "transaction date", "settlement date", "acquired", "bought", "date"],
+    "price": ["purchase price", "buy price", "price per share", "cost per share", "unit cost",
+              "average cost", "avg cost", "share price", "execution price", "price paid", "unit price", "price"],
+    "shares": ["number of shares", "no of shares", "share count", "shares", "quantity", "qty", "units"],
+}
+# Headers never mapped to a field even when a synonym matches: "Current Price" or
+# "Close" is the market price, not what was paid
+HEADER_EXCLUDE = {
+    "price": re.compile(r"\b(current|market|last|close|closing|today|todays)\b"),
+}
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%m/%d/%Y", "%m/%d/%y", "%m-%d-%Y", "%d.%m.%Y",
+                "%b %d %Y", "%B %d %Y", "%d %b %Y", "%d %B %Y", "%d-%b-%Y", "%d-%b-%y")
+TICKER_RE = re.compile(r"^[A-Z]{1,5}(?:[.-][A-Z])?$")
+SEPARATOR_RE = re.compile(r"^\s*\|?\s*:?-{2,}:?\s*(\|\s*:?-{2,}:?\s*)*\|?\s*$")
+SKIP_ROW_RE = re.compile(r"^(total|subtotal|grand total|sum|cash)\b", re.I)
+
+
+def _norm_header(h: str) -> str:
+    return " ".join(re.sub(r"[^a-z0-9 ]", " ", h.lower()).split())
+
+
+def _split_row(line: str) -> list[str]:
+    cells = [c.replace("<br>", " ").strip() for c in line.strip().split("|")]
+    # Drop the empty cells produced by leading / trailing border pipes
+    if cells and cells[0] == "":
+        cells = cells[1:]
+    if cells and cells[-1] == "":
+        cells = cells[:-1]
+    return cells
+
+
+def map_columns(headers: list[str]) -> dict[str, int] | None:
+    """Column index per field, or None if any field has no matching header."""
+    normed = [_norm_header(h) for h in headers]
+    mapping = {}
+    for field, synonyms in HEADER_SYNONYMS.items():
+        exclude = HEADER_EXCLUDE.get(field)
+        usable = [(i, h) for i, h in enumerate(normed) if not (exclude and exclude.search(h))]
+        for syn in synonyms:
+            # Exact match first, then a header containing the synonym as whole words
+            idx = next((i for i, h in usable if h == syn and i not in mapping.values()), None)
+            if idx is None:
+                idx = next((i for i, h in usable
+                            if re.search(rf"\b{syn}\b", h) and i not in mapping.values()), None)
+            if idx is not None:
+                mapping[field] = idx
+                break
+        else:
+            return None
+    return mapping
+
+
+def parse_number(cell: str) -> float | None:
+    s = cell.strip()
+    negative = s.startswith("(") and s.endswith(")")
+    s = re.sub(r"[^\d.\-]", "", s.replace(",", ""))
+    try:
+        value = float(s)
+    except ValueError:
+        return None
+    return -value if negative else value
+
+
+def parse_date(cell: str) -> str | None:
+    s = " ".join(cell.replace(",", " ").split())
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(s, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_ticker(cell: str) -> str | None:
+    s = cell.strip()
+    # "Apple Inc. (AAPL)" → AAPL
+    m = re.search(r"\(([A-Za-z.\-]{1,7})\)", s)
+    if m:
+        s = m.group(1)
+    s = s.upper()
+    return s if TICKER_RE.match(s) else None
+
+
+def parse_purchase_table(content: str) -> list[dict] | None:
+    """
+    Deterministically extracts purchase rows from a markdown pipe table.
+    Returns a list of {ticker, purchase_date, price, shares} dicts, or None when
+    the table cannot be mapped (no pipe header, unknown columns, or most rows
+    unparseable) so the caller can fall back to the LLM.
+    """
+    lines = [l for l in content.splitlines() if "|" in l and not SEPARATOR_RE.match(l)]
+    if len(lines) < 2:
+        return None
+
+    mapping = map_columns(_split_row(lines[0]))
+    if mapping is None:
+        return None
+
+    rows, failed = [], 0
+    for line in lines[1:]:
+        cells = _split_row(line)
+        if not any(cells) or (cells and SKIP_ROW_RE.match(cells[0])):
+            continue
+        if len(cells) <= max(mapping.values()):
+            failed += 1
+            continue
+        ticker = parse_ticker(cells[mapping["ticker"]])
+        date = parse_date(cells[mapping["purchase_date"]])
+        price = parse_number(cells[mapping["price"]])
+        shares = parse_number(cells[mapping["shares"]])
+        if None in (ticker, date, price, shares):
+            failed += 1
+            continue
+        rows.append({
+            "ticker": ticker,
+            "purchase_date": date,
+            "price": price,
+            "shares": int(shares) if float(shares).is_integer() else shares,
+        })
+
+    if not rows or failed > len(rows):
+        return None
+    return rows
+
+
+def _norm_token(token: str) -> str:
+    token = token.strip("$€£%(),;:*").lower()
+    date = parse_date(token)
+    if date:
+        return date
+    try:
+        return repr(float(token.replace(",", "")))
+    except ValueError:
+        return token
+
+
+def table_fingerprint(content: str) -> str:
+    """
+    Hash of a table's normalized cell tokens, independent of layout and cell order.
+    Pipe and whitespace layout, number formatting ("$1,200.00" == "1200") and
+    ISO / US date formats all normalize to the same tokens, so the markdown and
+    unstructured renderings of one table collide.
+    """
+    tokens = [_norm_token(t) for t in re.split(r"[|\s]+", content.replace("<br>", " "))]
+    tokens = sorted(t for t in tokens if t and not set(t) <= set("-:"))
+    return hashlib.sha1(" ".join(tokens).encode()).hexdigest()
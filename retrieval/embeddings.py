@@ -0,0 +1,113 @@
+import os
+from functools import lru_cache
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+from outbound import openai_client_kwargs
+
+# openai | onnx | sentence-transformers
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai")
+# Model for the local backends (must ship onnx/model.onnx for the onnx backend)
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBED_BATCH_SIZE = 64
+EMBED_THREADS = os.cpu_count() or 1
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Local CPU embeddings through ONNX Runtime: mean-pooled, L2-normalised
+    sentence-transformers vectors, encoded in batches on `num_threads` threads.
+    """
+
+    backend = "onnx"
+
+    def __init__(self, model_name: str = LOCAL_EMBEDDING_MODEL,
+                 batch_size: int = EMBED_BATCH_SIZE, num_threads: int = EMBED_THREADS,
+                 max_length: int = 256):
+        import onnxruntime as ort
+        from huggingface_hub import hf_hub_download
+        from transformers import AutoTokenizer
+
+        self.model = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = num_threads
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            hf_hub_download(model_name, "onnx/model.onnx"),
+            sess_options=opts,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode(self, texts: list[str]) -> np.ndarray:
+        enc = self.tokenizer(texts, padding=True, truncation=True,
+                             max_length=self.max_length, return_tensors="np")
+        feeds = {k: v.astype("int64") for k, v in enc.items() if k in self.input_names}
+        hidden = self.session.run(None, feeds)[0]                  # (batch, seq, dim)
+        mask = enc["attention_mask"][..., None].astype("float32")
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.linalg.norm(pooled, axis=1, keepdims=True)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        # Sort by length so each batch pads to similar sizes, then restore order
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        vecs = np.vstack([
+            self._encode([texts[i] for i in order[start:start + self.batch_size]])
+            for start in range(0, len(order), self.batch_size)
+        ])
+        out = np.empty_like(vecs)
+        out[order] = vecs
+        return out.tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._encode([text])[0].tolist()
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """Local CPU embeddings through sentence-transformers (PyTorch), batched and multi-threaded."""
+
+    backend = "sentence-transformers"
+
+    def __init__(self, model_name: str = LOCAL_EMBEDDING_MODEL,
+                 batch_size: int = EMBED_BATCH_SIZE, num_threads: int = EMBED_THREADS):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        torch.set_num_threads(num_threads)
+        self.model = model_name
+        self.batch_size = batch_size
+        self.encoder = SentenceTransformer(model_name, device="cpu")
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.encoder.encode(texts, batch_size=self.batch_size,
+                                   normalize_embeddings=True).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.encoder.encode(text, normalize_embeddings=True).tolist()
+
+
+@lru_cache(maxsize=None)
+def get_embeddings(backend: str = EMBEDDING_BACKEND, model_name: str | None = None) -> Embeddings:
+    """Process-wide embedding client for `backend` (local models are loaded once)."""
+    if backend == "openai":
+        kwargs = openai_client_kwargs("openai-embeddings")
+        return OpenAIEmbeddings(model=model_name, **kwargs) if model_name else OpenAIEmbeddings(**kwargs)
+    if backend == "onnx":
+        return OnnxEmbeddings(model_name or LOCAL_EMBEDDING_MODEL)
+    if backend == "sentence-transformers":
+        return SentenceTransformerEmbeddings(model_name or LOCAL_EMBEDDING_MODEL)
+    raise ValueError(f"Unknown embedding backend {backend!r}")
+
+
+def embedding_signature(embeddings: Embeddings) -> dict:
+    """Backend + model identifying the vector space an index was built in."""
+    return {
+        "embedding_backend": getattr(embeddings, "backend", "openai"),
+        "embedding_model": getattr(embeddings, "model", type(embeddings).__name__),
+    }
@@ -1,39 +1,238 @@
+import os
 import json
+import time
 import uuid
-import pickle
+import shutil
+import threading
+from collections import Counter
+from contextlib import contextmanager
 from pathlib import Path
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings
 from langchain.schema import Document
-from langchain.storage import InMemoryStore
-from langchain.retrievers.multi_vector import MultiVectorRetriever
+from retrieval.hybrid import HybridRetriever, HOLDINGS_FIELD, extract_metadata
+from retrieval.index_types import make_index, tune_index
+from retrieval.embeddings import get_embeddings, embedding_signature
 
-# Directory to store the FAISS index and optional document store
+# Directory to store the FAISS index
 INDEX_DIR   = "faiss_index_folder"                 
-DOCSTORE_P  = Path(INDEX_DIR) / "docstore.pkl"     
+INDEX_FILE      = "index.faiss"        # written by FAISS.save_local; marks a complete snapshot
+INDEX_META_NAME = "index_meta.json"
+SUMMARIES_NAME  = "summaries.json"     # copy of the summaries the index was built from
+# flat | ivf | hnsw | pq | sq (see retrieval/index_types.py)
+INDEX_TYPE  = os.getenv("FAISS_INDEX_TYPE", "flat")
 
-def build_retriever(summary_path: str = "summaries.json") -> MultiVectorRetriever:
+# Each build is written to its own snapshot under <index_dir>/versions/ and published
+# by atomically replacing the CURRENT pointer file with the snapshot's name
+VERSIONS_DIR   = "versions"
+CURRENT_NAME   = "CURRENT"
+PARTIAL_SUFFIX = ".partial"
+# Published snapshots kept on disk (newest first) for rollback and for slow readers
+KEEP_VERSIONS  = int(os.getenv("INDEX_KEEP_VERSIONS", "3"))
+# Unfinished builds older than this are assumed abandoned and removed
+STALE_PARTIAL_SECONDS = 3600
+# Files of an index saved directly in index_dir, before snapshots existed
+LEGACY_FILES = (INDEX_FILE, "index.pkl", INDEX_META_NAME, SUMMARIES_NAME)
+
+# (index_dir, version) -> number of in-process readers loading that snapshot
+_pins = Counter()
+_pins_lock = threading.Lock()
+
+
+def _version_number(name: str) -> int:
+    return int(name[1:].split("-", 1)[0])
+
+
+def list_versions(index_dir: str = INDEX_DIR) -> list[str]:
+    """Complete snapshots in `index_dir`, oldest first."""
+    root = Path(index_dir) / VERSIONS_DIR
+    if not root.is_dir():
+        return []
+    names = [p.name for p in root.iterdir() if p.is_dir() and not p.name.endswith(PARTIAL_SUFFIX)]
+    return sorted(names, key=_version_number)
+
+
+def current_version(index_dir: str = INDEX_DIR) -> str | None:
+    """Name of the published snapshot, or None if nothing was published yet."""
+    try:
+        return (Path(index_dir) / CURRENT_NAME).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def version_path(index_dir: str, version: str | None) -> Path:
+    """Directory holding `version`; None means an index saved directly in index_dir."""
+    return Path(index_dir) / VERSIONS_DIR / version if version else Path(index_dir)
+
+
+def publish_version(index_dir: str, version: str):
+    """Points CURRENT at `version`; os.replace makes the switch atomic for every reader."""
+    if not version_path(index_dir, version).is_dir():
+        raise FileNotFoundError(f"No snapshot {version} in {index_dir}")
+    tmp = Path(index_dir) / f"{CURRENT_NAME}.{uuid.uuid4().hex}.tmp"
+    tmp.write_text(version)
+    os.replace(tmp, Path(index_dir) / CURRENT_NAME)
+
+
+def rollback(index_dir: str = INDEX_DIR, version: str | None = None) -> str:
+    """
+    Re-publishes `version`, or the snapshot before the current one.
+    Only the pointer changes, so rolling back is instant. Returns the published version.
+    """
+    versions = list_versions(index_dir)
+    if version is None:
+        current = current_version(index_dir)
+        older = [v for v in versions if current and _version_number(v) < _version_number(current)]
+        if not older:
+            raise ValueError(f"No snapshot older than {current} in {index_dir}")
+        version = older[-1]
+    publish_version(index_dir, version)
+    return version
+
+
+@contextmanager
+def pinned(index_dir: str, version: str | None):
+    """Keeps gc_versions from deleting `version` while it is being read."""
+    key = (str(Path(index_dir).resolve()), version)
+    with _pins_lock:
+        _pins[key] += 1
+    try:
+        yield version_path(index_dir, version)
+    finally:
+        with _pins_lock:
+            _pins[key] -= 1
+            if not _pins[key]:
+                del _pins[key]
+
+
+def gc_versions(index_dir: str = INDEX_DIR, keep: int = KEEP_VERSIONS) -> list[str]:
     """
-    Returns a ready-to-use MultiVectorRetriever.
-    Loads an existing FAISS index if available; otherwise builds a new one from the provided JSON summary file.
+    Deletes snapshots beyond the newest `keep`, never the current or a pinned one,
+    plus abandoned partial builds and files left by an unversioned index.
+    Returns the removed version names.
     """
+    root = Path(index_dir)
+    current = current_version(index_dir)
+    with _pins_lock:
+        in_use = {v for (d, v), n in _pins.items() if d == str(root.resolve()) and n}
+    removed = []
+    for version in list_versions(index_dir)[:-keep or None]:
+        if version != current and version not in in_use:
+            shutil.rmtree(version_path(index_dir, version), ignore_errors=True)
+            removed.append(version)
+
+    versions_root = root / VERSIONS_DIR
+    if versions_root.is_dir():
+        for p in versions_root.glob(f"*{PARTIAL_SUFFIX}"):
+            if time.time() - p.stat().st_mtime > STALE_PARTIAL_SECONDS:
+                shutil.rmtree(p, ignore_errors=True)
+    if current and None not in in_use:
+        for name in LEGACY_FILES:
+            (root / name).unlink(missing_ok=True)
+    return removed
+
 
-    # Load previously saved vector index and document store (if available)
-    if Path(INDEX_DIR).is_dir() and DOCSTORE_P.exists():
-        print("Loading existing FAISS index & doc-store …")
+def build_vectorstore(docs: list[Document], embeddings, index_type: str = INDEX_TYPE) -> FAISS:
+    """
+    Embeds `docs` once, trains an index of the requested type on those
+    embeddings and wraps it in a LangChain FAISS store.
+    """
+    vectors = np.asarray(embeddings.embed_documents([d.page_content for d in docs]), dtype="float32")
+    vectorstore = FAISS(
+        embedding_function=embeddings,
+        index=make_index(index_type, vectors),
+        docstore=InMemoryDocstore(),
+        index_to_docstore_id={},
+    )
+    vectorstore.add_embeddings(
+        list(zip([d.page_content for d in docs], vectors.tolist())),
+        metadatas=[d.metadata for d in docs],
+    )
+    return vectorstore
+
+
+def index_matches(embeddings, index_dir: str = INDEX_DIR) -> bool:
+    """
+    True if the saved index was built with the same embedding backend and model.
+    Indexes saved before metadata was recorded were always built with OpenAI.
+    """
+    meta_p = Path(index_dir) / INDEX_META_NAME
+    meta = json.loads(meta_p.read_text()) if meta_p.exists() else {}
+    built_with = {
+        "embedding_backend": meta.get("embedding_backend", "openai"),
+        "embedding_model": meta.get("embedding_model", "text-embedding-ada-002"),
+    }
+    return built_with == embedding_signature(embeddings)
+
+
+def load_retriever(index_dir: str = INDEX_DIR, version: str | None = None) -> HybridRetriever | None:
+    """
+    Loads snapshot `version` of the index in `index_dir` (default: the published one).
+    Returns None if there is none, or if it was built with another embedding backend/model.
+    """
+    version = version or current_version(index_dir)
+    with pinned(index_dir, version) as path:
+        if not (path.is_dir() and (path / INDEX_FILE).exists()):
+            return None
+        embeddings = get_embeddings()
+        if not index_matches(embeddings, str(path)):
+            print(f"⚠️   Index in {path} was built with a different embedding model")
+            return None
+
+        print(f"Loading existing FAISS index from {path} …")
         vectorstore = FAISS.load_local(
-            INDEX_DIR,
-            OpenAIEmbeddings(),
+            str(path),
+            embeddings,
             allow_dangerous_deserialization=True 
         )
-        with DOCSTORE_P.open("rb") as f:
-            docstore = pickle.load(f)
+    tune_index(vectorstore.index)
+    return HybridRetriever(vectorstore=vectorstore)
 
-        return MultiVectorRetriever(
-            vectorstore=vectorstore,
-            docstore=docstore,
-            id_key="doc_id",
-        )
+
+def build_retriever(summary_path: str = "summaries.json", index_type: str = INDEX_TYPE,
+                    index_dir: str = INDEX_DIR) -> HybridRetriever:
+    """
+    Returns a ready-to-use HybridRetriever (BM25 + FAISS with ticker prefiltering).
+    Loads the published index in `index_dir` if available and built with the
+    configured embedding backend/model; otherwise builds and publishes a new
+    snapshot of `index_type` from the provided JSON summary file.
+    """
+    retriever = load_retriever(index_dir)
+    if retriever is not None:
+        return retriever
+    return build_snapshot(summary_path, index_type, index_dir)[0]
+
+
+def build_snapshot(summary_path: str = "summaries.json", index_type: str = INDEX_TYPE,
+                   index_dir: str = INDEX_DIR) -> tuple[HybridRetriever, str]:
+    """
+    Builds a new snapshot of the index from `summary_path` and publishes it.
+    The snapshot is written under a partial name and renamed once complete, so
+    readers only ever see the previous snapshot or the finished new one.
+    Returns (retriever, version).
+    """
+    versions = list_versions(index_dir)
+    number = _version_number(versions[-1]) + 1 if versions else 1
+    version = f"v{number:06d}-{uuid.uuid4().hex[:8]}"
+    staging = version_path(index_dir, version + PARTIAL_SUFFIX)
+    staging.mkdir(parents=True)
+    try:
+        retriever = _write_index(summary_path, index_type, staging)
+        staging.rename(version_path(index_dir, version))
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    publish_version(index_dir, version)
+    removed = gc_versions(index_dir)
+    print(f"📌 Published index {version} in {index_dir}" + (f" (removed {', '.join(removed)})" if removed else ""))
+    return retriever, version
+
+
+def _write_index(summary_path: str, index_type: str, index_dir: Path) -> HybridRetriever:
+    """Embeds the summaries and saves index, metadata and summaries copy into `index_dir`."""
+    embeddings = get_embeddings()
 
     # Build new vector index from summaries
     print("🛠️   Building FAISS index from", summary_path)
@@ -43,6 +242,7 @@ def build_retriever(summary_path: str = "summaries.json") -> MultiVectorRetrieve
     # Separate each type of content by source
     texts, tables, charts = [], [], []
     text_sum, table_sum, chart_sum = [], [], []
+    table_meta = []
 
     for item in all_data:
         if item["type"] == "text":
@@ -53,48 +253,55 @@ def build_retriever(summary_path: str = "summaries.json") -> MultiVectorRetrieve
 
         elif item["type"] == "table":
             # Parsed table summary from markdown or PDF tables
+            summary = item["summary"]
+            if isinstance(summary, list):
+                # summaries.json written before tables were de-duplicated
+                summary = "\n".join(summary) or item["raw"]
             tables.append(item["raw"])
-            table_sum.append(item["summary"])
+            table_sum.append(summary)
+            # Extractors that found this table (markdown and/or pdf), and the
+            # tickers of its parsed purchase rows (matched in queries in any case)
+            rows = [r for r in item.get("rows") or [] if isinstance(r, dict) and r.get("ticker")]
+            table_meta.append({
+                "sources": item.get("sources", [item["source"]]),
+                HOLDINGS_FIELD: sorted({str(r["ticker"]).upper() for r in rows}),
+            })
 
         elif item["type"] == "chart":
             # LLM-interpreted chart data (from image-to-JSON)
             charts.append(item["extracted"])
             chart_sum.append(json.dumps(item["extracted"]))
 
-    # Assign UUIDs so we can trace each document if needed (not used)
+    # Assign UUIDs so we can trace each document (stored as doc_id metadata)
     text_ids  = [str(uuid.uuid4()) for _ in text_sum]
     table_ids = [str(uuid.uuid4()) for _ in table_sum]
     chart_ids = [str(uuid.uuid4()) for _ in chart_sum]
 
-    # Create documents to embed into the FAISS vector store
+    # Create documents to embed into the FAISS vector store,
+    # tagging each with the tickers / dates it mentions for prefiltering
+    def make_doc(s, i, t, extra=None):
+        meta = extract_metadata(f"{s}\n{t}")
+        return Document(page_content=s, metadata={"doc_id": i, "original": t, **meta, **(extra or {})})
+
     summary_docs = (
-        [Document(page_content=s, metadata={"doc_id": i, "original": t})
-         for s, i, t in zip(text_sum,  text_ids,  texts)]  +
-        [Document(page_content=s, metadata={"doc_id": i, "original": t})
-         for s, i, t in zip(table_sum, table_ids, tables)] +
-        [Document(page_content=s, metadata={"doc_id": i, "original": t})
-         for s, i, t in zip(chart_sum, chart_ids, charts)]
+        [make_doc(s, i, t) for s, i, t in zip(text_sum,  text_ids,  texts)]  +
+        [make_doc(s, i, t, m) for s, i, t, m in zip(table_sum, table_ids, tables, table_meta)] +
+        [make_doc(s, i, t) for s, i, t in zip(chart_sum, chart_ids, charts)]
     )
 
     # Build and save the FAISS index
-    vectorstore = FAISS.from_documents(summary_docs, OpenAIEmbeddings())
-    vectorstore.save_local(INDEX_DIR)
-
-    #Build and save docstore (optional — used for full-text traceability)
-    docstore = InMemoryStore()
-    docstore.mset(
-        list(zip(text_ids,  text_sum)) +
-        list(zip(table_ids, table_sum)) +
-        list(zip(chart_ids, chart_sum))
-    )
-    DOCSTORE_P.parent.mkdir(parents=True, exist_ok=True)
-    with DOCSTORE_P.open("wb") as f:
-        pickle.dump(docstore, f)
+    vectorstore = build_vectorstore(summary_docs, embeddings, index_type)
+    vectorstore.save_local(str(index_dir))
+    (Path(index_dir) / INDEX_META_NAME).write_text(json.dumps({
+        "index_type": index_type,
+        "index_class": type(faiss.downcast_index(vectorstore.index)).__name__,
+        "ntotal": vectorstore.index.ntotal,
+        "dim": vectorstore.index.d,
+        **embedding_signature(embeddings),
+    }))
+    if Path(summary_path).resolve() != (Path(index_dir) / SUMMARIES_NAME).resolve():
+        shutil.copyfile(summary_path, Path(index_dir) / SUMMARIES_NAME)
 
     print("Vectorstore & retriever are ready.")
     #Create Retriever
-    return MultiVectorRetriever(
-        vectorstore=vectorstore,
-        docstore=docstore,
-        id_key="doc_id",
-    )
+    return HybridRetriever(vectorstore=vectorstore)
@@ -0,0 +1,228 @@
+import math
+import re
+from collections import Counter, defaultdict
+import numpy as np
+from pydantic import ConfigDict, PrivateAttr
+from langchain.schema import Document
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+
+# Upper-case words that look like tickers but never are in our statements
+NOT_TICKERS = {
+    "AI", "AM", "PM", "US", "USA", "USD", "EUR", "GBP", "PDF", "JSON", "ETF", "YTD",
+    "CEO", "CFO", "EPS", "IPO", "IRA", "LLC", "INC", "LTD", "NYSE", "SEC", "GDP",
+    "CPI", "FED", "THE", "AND", "FOR", "NA", "ID", "OK", "PE", "QTY", "DATE", "TOTAL",
+    "CASH", "BUY", "SELL", "NOTE", "Q1", "Q2", "Q3", "Q4",
+}
+TICKER_RE   = re.compile(r"\b[A-Z]{2,5}(?:\.[A-Z])?\b")
+CASHTAG_RE  = re.compile(r"\$([A-Za-z]{1,5}(?:\.[A-Za-z])?)\b")
+ISO_DATE_RE = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b")
+US_DATE_RE  = re.compile(r"\b(\d{1,2})/(\d{1,2})/(\d{4})\b")
+YEAR_RE     = re.compile(r"\b(?:19|20)\d{2}\b")
+TOKEN_RE    = re.compile(r"[a-z0-9]+(?:\.[a-z0-9]+)*")
+
+# Metadata fields covered by the inverted index
+FILTER_FIELDS = ("tickers", "dates", "years")
+# Metadata field with the tickers of a table's parsed purchase rows
+HOLDINGS_FIELD = "holdings"
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+def extract_tickers(text: str) -> list[str]:
+    return sorted({t for t in TICKER_RE.findall(text) if t not in NOT_TICKERS})
+
+
+def query_tickers(query: str, holdings: set[str]) -> set[str]:
+    """
+    Tickers a query names: words the user wrote in upper case, $cashtags in any
+    case, and known holdings (tickers from parsed table rows) in any case.
+    Lower-case words like "is" or "all" never match all-caps text in documents.
+    """
+    named = set(extract_tickers(query))
+    named |= {t.upper() for t in CASHTAG_RE.findall(query)}
+    named |= {t.upper() for t in tokenize(query)} & holdings
+    return named
+
+
+def extract_dates(text: str) -> list[str]:
+    dates = {f"{y}-{int(m):02d}-{int(d):02d}" for y, m, d in ISO_DATE_RE.findall(text)}
+    dates |= {f"{y}-{int(m):02d}-{int(d):02d}" for m, d, y in US_DATE_RE.findall(text)}
+    return sorted(dates)
+
+
+def extract_metadata(text: str) -> dict:
+    """
+    Ticker / date metadata stored alongside each chunk at index time.
+    Used by HybridRetriever to prefilter candidates before scoring.
+    """
+    return {
+        "tickers": extract_tickers(text),
+        "dates": extract_dates(text),
+        "years": sorted(set(YEAR_RE.findall(text))),
+    }
+
+
+class _BM25:
+    """Okapi BM25 with per-term postings so scoring only touches matching documents."""
+
+    def __init__(self, corpus: list[list[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1, self.b = k1, b
+        self.doc_tf = [Counter(tokens) for tokens in corpus]
+        self.doc_len = [len(tokens) for tokens in corpus]
+        self.avgdl = (sum(self.doc_len) / len(corpus)) if corpus else 0.0
+        self.postings = defaultdict(dict)
+        for i, tf in enumerate(self.doc_tf):
+            for term, n in tf.items():
+                self.postings[term][i] = n
+        N = len(corpus)
+        self.idf = {
+            term: math.log(1 + (N - len(p) + 0.5) / (len(p) + 0.5))
+            for term, p in self.postings.items()
+        }
+
+    def _term_score(self, tf: int, doc: int) -> float:
+        norm = self.k1 * (1 - self.b + self.b * self.doc_len[doc] / (self.avgdl or 1.0))
+        return tf * (self.k1 + 1) / (tf + norm)
+
+    def scores(self, query: list[str], candidates: set[int] | None = None) -> dict[int, float]:
+        out = defaultdict(float)
+        for term in set(query):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf[term]
+            # Walk whichever side is smaller: the term's postings or the candidate set
+            if candidates is not None and len(candidates) < len(postings):
+                hits = ((d, self.doc_tf[d][term]) for d in candidates if term in self.doc_tf[d])
+            else:
+                hits = ((d, tf) for d, tf in postings.items() if candidates is None or d in candidates)
+            for d, tf in hits:
+                out[d] += idf * self._term_score(tf, d)
+        return dict(out)
+
+
+def _minmax(scores: dict[int, float]) -> dict[int, float]:
+    if not scores:
+        return {}
+    lo, hi = min(scores.values()), max(scores.values())
+    if hi == lo:
+        return {d: 1.0 for d in scores}
+    return {d: (s - lo) / (hi - lo) for d, s in scores.items()}
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever over a FAISS store that fuses BM25 and vector similarity.
+    Queries naming a known ticker (or date / year) are first narrowed through an
+    inverted index on chunk metadata, so scoring cost follows that ticker's
+    documents rather than the whole corpus. When none of those documents is
+    among the dense top fetch_k, they are ranked together with the global dense
+    and BM25 results instead; when there are fewer than k, those results fill
+    the remaining slots.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vectorstore: FAISS
+    # Chunks returned; parse_docs' token budget decides how many reach the prompt
+    k: int = 20
+    fetch_k: int = 20
+    alpha: float = 0.5   # weight of the vector score; 1 - alpha goes to BM25
+
+    _docs: list = PrivateAttr(default_factory=list)
+    _bm25: _BM25 = PrivateAttr(default=None)
+    _inverted: dict = PrivateAttr(default_factory=dict)
+    _holdings: set = PrivateAttr(default_factory=set)
+
+    def model_post_init(self, __context) -> None:
+        vs = self.vectorstore
+        self._docs = [vs.docstore.search(vs.index_to_docstore_id[i]) for i in range(vs.index.ntotal)]
+        self._bm25 = _BM25([tokenize(d.page_content) for d in self._docs])
+
+        self._inverted = {field: defaultdict(set) for field in FILTER_FIELDS}
+        for i, doc in enumerate(self._docs):
+            meta = doc.metadata
+            if not all(field in meta for field in FILTER_FIELDS):
+                # Index built before metadata extraction existed
+                meta = {**extract_metadata(doc.page_content), **meta}
+            for field in FILTER_FIELDS:
+                for value in meta.get(field, []):
+                    self._inverted[field][value].add(i)
+            self._holdings.update(meta.get(HOLDINGS_FIELD, []))
+
+    def _prefilter(self, query: str) -> set[int] | None:
+        """Candidate doc positions for the tickers / dates named in the query (None = no filter)."""
+        wanted = {
+            "tickers": query_tickers(query, self._holdings) & self._inverted["tickers"].keys(),
+            "dates": set(extract_dates(query)),
+            "years": set(YEAR_RE.findall(query)),
+        }
+        matches = []
+        for field, values in wanted.items():
+            docs = set().union(*(self._inverted[field].get(v, set()) for v in values)) if values else None
+            if docs:
+                matches.append((field, docs))
+        if not matches:
+            return None
+
+        candidates = set.intersection(*(docs for _, docs in matches))
+        if candidates:
+            return candidates
+        # No chunk satisfies every constraint; the ticker is the strongest signal
+        return next((docs for field, docs in matches if field == "tickers"), None)
+
+    def _vector_scores(self, q: np.ndarray, ids: list[int]) -> dict[int, float]:
+        if not ids:
+            return {}
+        vecs = self.vectorstore.index.reconstruct_batch(np.asarray(ids, dtype="int64"))
+        if self.vectorstore.distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT:
+            sims = vecs @ q
+        else:
+            sims = -np.sum((vecs - q) ** 2, axis=1)
+        return dict(zip(ids, sims.tolist()))
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        if not self._docs:
+            return []
+
+        q = np.asarray(self.vectorstore.embeddings.embed_query(query), dtype="float32")
+        q_tokens = tokenize(query)
+        candidates = self._prefilter(query)
+        _, I = self.vectorstore.index.search(q.reshape(1, -1), min(self.fetch_k, len(self._docs)))
+        dense_top = {int(i) for i in I[0] if i >= 0}
+
+        ranked = []
+        if candidates is not None and candidates & dense_top:
+            ranked = self._fuse(q, sorted(candidates), self._bm25.scores(q_tokens, candidates))
+            if len(ranked) >= self.k:
+                return self._documents(ranked[: self.k])
+
+        # No metadata hit, the matching chunks are all far from the query (e.g. a
+        # disclaimer naming the ticker) or too few: union of the dense and lexical
+        # top fetch_k, ranked after any prefiltered chunks already taken
+        bm25 = self._bm25.scores(q_tokens)
+        top_bm25 = sorted(bm25, key=bm25.get, reverse=True)[: self.fetch_k]
+        ids = sorted((dense_top | set(top_bm25) | (candidates or set())) - {d for d, _ in ranked})
+        ranked += self._fuse(q, ids, {d: bm25[d] for d in ids if d in bm25})
+        return self._documents(ranked[: self.k])
+
+    def _fuse(self, q: np.ndarray, ids: list[int], bm25: dict[int, float]) -> list[tuple[int, float]]:
+        """(doc position, fused score) for `ids`, best first."""
+        vec = _minmax(self._vector_scores(q, ids))
+        lex = _minmax(bm25)
+        fused = {d: self.alpha * vec.get(d, 0.0) + (1 - self.alpha) * lex.get(d, 0.0) for d in ids}
+        return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+    def _documents(self, ranked: list[tuple[int, float]]) -> list[Document]:
+        return [
+            Document(page_content=self._docs[d].page_content,
+                     metadata={**self._docs[d].metadata, "score": score})
+            for d, score in ranked
+        ]
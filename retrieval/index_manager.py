@@ -0,0 +1,198 @@
+import os
+import re
+import sys
+import time
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from retrieval.faiss_store import (
+    INDEX_DIR, SUMMARIES_NAME, INDEX_FILE,
+    build_snapshot, load_retriever, current_version, list_versions, version_path, rollback,
+)
+
+# Retrievers kept in memory at once, and their total on-disk footprint
+MAX_RESIDENT_INDEXES = int(os.getenv("MAX_RESIDENT_INDEXES", "8"))
+INDEX_MEMORY_BUDGET_MB = float(os.getenv("INDEX_MEMORY_BUDGET_MB", "1024"))
+# Namespace used when the caller does not identify a client / session
+DEFAULT_CLIENT = "default"
+
+
+def _dir_bytes(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+class IndexManager:
+    """
+    Process-wide registry of per-client retrievers.
+    Each client's index lives in its own directory under `root` as versioned
+    snapshots (see retrieval/faiss_store.py). The most recently used ones stay
+    resident, bounded by count and by a memory budget, and the least recently
+    used are dropped from memory (they remain on disk and are cold-loaded on
+    next use). A resident retriever is reloaded when its client's published
+    version changes, e.g. after a rebuild in another process or a rollback.
+    """
+
+    def __init__(self, root: str = INDEX_DIR,
+                 max_resident: int = MAX_RESIDENT_INDEXES,
+                 memory_budget_mb: float = INDEX_MEMORY_BUDGET_MB):
+        self.root = Path(root)
+        self.max_resident = max_resident
+        self.memory_budget = int(memory_budget_mb * 1e6)
+        self._resident = OrderedDict()        # client_id -> (retriever, bytes, version)
+        self._lock = threading.Lock()
+        self._load_locks = {}                 # client_id -> Lock, so one cold load per client;
+                                              # kept only while the client is resident or loading
+        self.stats = {
+            "hits": 0,
+            "cold_loads": 0,
+            "cold_load_seconds": 0.0,
+            "misses": 0,                      # no index on disk either
+            "builds": 0,
+            "swaps": 0,                       # resident retriever replaced by a newer / rolled-back version
+            "rollbacks": 0,
+            "evictions": 0,
+        }
+
+    def index_dir(self, client_id: str) -> Path:
+        # Client ids come from sessions / URLs; keep them to a safe directory name
+        return self.root / re.sub(r"[^A-Za-z0-9_.-]", "_", client_id)
+
+    def summary_path(self, client_id: str) -> Path:
+        """The summaries.json the client's published index was built from."""
+        index_dir = self.index_dir(client_id)
+        return version_path(str(index_dir), current_version(str(index_dir))) / SUMMARIES_NAME
+
+    def has_index(self, client_id: str) -> bool:
+        with self._lock:
+            if client_id in self._resident:
+                return True
+        index_dir = self.index_dir(client_id)
+        return (version_path(str(index_dir), current_version(str(index_dir))) / INDEX_FILE).exists()
+
+    def _resident_hit(self, client_id: str, version: str | None):
+        """The resident retriever if it is still the published version (caller holds _lock)."""
+        entry = self._resident.get(client_id)
+        if entry is None or entry[2] != version:
+            return None
+        self._resident.move_to_end(client_id)
+        self.stats["hits"] += 1
+        return entry[0]
+
+    def get(self, client_id: str = DEFAULT_CLIENT):
+        """
+        The client's retriever for its published version, cold-loading it from disk
+        if needed (None if never built). Callers holding an older retriever keep
+        using it until they finish; its snapshot is only deleted by GC.
+        """
+        # One small file read per query lets other processes' publishes take effect
+        version = current_version(str(self.index_dir(client_id)))
+        with self._lock:
+            hit = self._resident_hit(client_id, version)
+            if hit is not None:
+                return hit
+            load_lock = self._load_locks.setdefault(client_id, threading.Lock())
+
+        with load_lock:
+            # Another thread may have finished the load while we waited
+            with self._lock:
+                hit = self._resident_hit(client_id, version)
+                if hit is not None:
+                    return hit
+
+            t0 = time.perf_counter()
+            retriever = load_retriever(str(self.index_dir(client_id)), version)
+            elapsed = time.perf_counter() - t0
+            if retriever is None:
+                with self._lock:
+                    self.stats["misses"] += 1
+                    self._load_locks.pop(client_id, None)
+                return None
+
+            with self._lock:
+                self.stats["cold_loads"] += 1
+                self.stats["cold_load_seconds"] += elapsed
+            print(f"❄️  Cold-loaded index {version or '(unversioned)'} for {client_id} in {elapsed:.2f}s")
+            self._admit(client_id, retriever, version)
+            return retriever
+
+    def build(self, client_id: str, summary_path: str, **kwargs):
+        """
+        Builds a new snapshot of the client's index from `summary_path`, publishes it
+        and makes it resident. Queries keep using the previous snapshot until the
+        pointer swap, and in-flight ones finish on it.
+        """
+        retriever, version = build_snapshot(summary_path, index_dir=str(self.index_dir(client_id)), **kwargs)
+        with self._lock:
+            self.stats["builds"] += 1
+        self._admit(client_id, retriever, version)
+        return retriever
+
+    def rollback(self, client_id: str, version: str | None = None) -> str:
+        """
+        Re-publishes an earlier snapshot (default: the one before the current).
+        The pointer swap is instant; the retriever is loaded on the next get().
+        """
+        version = rollback(str(self.index_dir(client_id)), version)
+        with self._lock:
+            self.stats["rollbacks"] += 1
+        print(f"⏪ Rolled back index for {client_id} to {version}")
+        return version
+
+    def versions(self, client_id: str) -> dict:
+        index_dir = str(self.index_dir(client_id))
+        return {"current": current_version(index_dir), "versions": list_versions(index_dir)}
+
+    def evict(self, client_id: str) -> bool:
+        """Drops the client's retriever from memory; its index stays on disk."""
+        with self._lock:
+            self._drop_load_lock(client_id)
+            return self._resident.pop(client_id, None) is not None
+
+    def _drop_load_lock(self, client_id: str):
+        # Caller holds self._lock; a lock a load is running under stays until the next eviction
+        lock = self._load_locks.get(client_id)
+        if lock is not None and not lock.locked():
+            del self._load_locks[client_id]
+
+    def _admit(self, client_id: str, retriever, version: str | None):
+        size = _dir_bytes(version_path(str(self.index_dir(client_id)), version))
+        with self._lock:
+            if client_id in self._resident:
+                self.stats["swaps"] += 1
+            self._resident[client_id] = (retriever, size, version)
+            self._resident.move_to_end(client_id)
+            # Evict least recently used until within count and memory budget,
+            # never evicting the retriever just admitted
+            while len(self._resident) > 1 and (
+                len(self._resident) > self.max_resident or self.resident_bytes() > self.memory_budget
+            ):
+                evicted, (_, evicted_size, _) = self._resident.popitem(last=False)
+                self._drop_load_lock(evicted)
+                self.stats["evictions"] += 1
+                print(f"📤 Evicted index for {evicted} ({evicted_size / 1e6:.1f} MB)")
+
+    def resident_bytes(self) -> int:
+        return sum(size for _, size, _ in self._resident.values())
+
+    def snapshot(self) -> dict:
+        """Cache counters plus the resident clients (most recent last), for sizing the cache."""
+        with self._lock:
+            return {
+                **self.stats,
+                "resident": {client: version for client, (_, _, version) in self._resident.items()},
+                "resident_mb": self.resident_bytes() / 1e6,
+                "max_resident": self.max_resident,
+                "memory_budget_mb": self.memory_budget / 1e6,
+            }
+
+
+index_manager = IndexManager()
+
+
+if __name__ == "__main__":
+    # python -m retrieval.index_manager versions <client>
+    # python -m retrieval.index_manager rollback <client> [version]
+    command, client = sys.argv[1], sys.argv[2]
+    if command == "rollback":
+        index_manager.rollback(client, sys.argv[3] if len(sys.argv) > 3 else None)
+    print(index_manager.versions(client))
@@ -0,0 +1,84 @@
+import math
+import faiss
+import numpy as np
+
+# Supported FAISS index layouts
+#   flat → exact brute-force search, full float32 vectors
+#   ivf  → inverted lists over k-means cells, full vectors (search probes NPROBE cells)
+#   hnsw → graph-based search, full vectors, no training
+#   pq   → IVF + product quantization (~16 dims per byte)
+#   sq   → IVF + 8-bit scalar quantization (4x smaller than float32)
+INDEX_TYPES = ("flat", "ivf", "hnsw", "pq", "sq")
+# Trained indexes fall back to flat below this many vectors (brute force is cheap there)
+MIN_TRAIN_POINTS = 256
+NPROBE = 16
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 64
+
+
+def _nlist(n: int) -> int:
+    # ~4·sqrt(n) cells, keeping >= 39 training points per cell as FAISS recommends
+    return max(1, min(int(4 * math.sqrt(n)), n // 39))
+
+
+def _pq_subquantizers(d: int) -> int:
+    # Largest divisor of d giving sub-vectors of at least 16 dims
+    return max(m for m in range(1, d // 16 + 1) if d % m == 0) if d >= 16 else 1
+
+
+def factory_string(index_type: str, n: int, d: int) -> str:
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}; expected one of {INDEX_TYPES}")
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "hnsw":
+        return f"HNSW{HNSW_M}"
+    nlist = _nlist(n)
+    if index_type == "ivf":
+        return f"IVF{nlist},Flat"
+    if index_type == "pq":
+        return f"IVF{nlist},PQ{_pq_subquantizers(d)}"
+    return f"IVF{nlist},SQ8"
+
+
+def make_index(index_type: str, vectors: np.ndarray, metric: int = faiss.METRIC_L2):
+    """
+    Creates an empty FAISS index of the requested type, trained on `vectors`.
+    The caller adds the vectors afterwards (e.g. through FAISS.add_embeddings).
+    """
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    n, d = vectors.shape
+    if index_type not in ("flat", "hnsw") and n < MIN_TRAIN_POINTS:
+        print(f"Only {n} vectors — using a flat index instead of {index_type!r}")
+        index_type = "flat"
+
+    index = faiss.index_factory(d, factory_string(index_type, n, d), metric)
+    if index_type == "hnsw":
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    if not index.is_trained:
+        index.train(vectors)
+    return tune_index(index)
+
+
+def tune_index(index, nprobe: int = NPROBE, ef_search: int = HNSW_EF_SEARCH):
+    """
+    Applies search-time parameters, which are not all persisted by faiss.write_index.
+    IVF indexes also get a direct map so stored vectors can be reconstructed by id.
+    """
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        ivf = None
+    if ivf is not None:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+        ivf.make_direct_map()
+    hnsw = getattr(faiss.downcast_index(index), "hnsw", None)
+    if hnsw is not None:
+        hnsw.efSearch = ef_search
+    return index
+
+
+def index_memory_bytes(index) -> int:
+    """Serialized size of the index — a close proxy for its resident memory."""
+    return int(faiss.serialize_index(index).nbytes)
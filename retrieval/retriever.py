@@ -1,20 +1,86 @@
+import re
+from functools import lru_cache
+from operator import itemgetter
+import tiktoken
 from langchain.schema import Document
 from langchain.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+from langchain_core.runnables import RunnableLambda
 from langchain_openai import ChatOpenAI
+from outbound import openai_client_kwargs
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.messages import HumanMessage
 
-def parse_docs(docs):
+# Max tokens of retrieved context placed in the prompt
+CONTEXT_TOKEN_BUDGET = 2000
+# Word-shingle Jaccard similarity above which two chunks count as duplicates
+DUPLICATE_THRESHOLD = 0.9
+
+@lru_cache(maxsize=1)
+def _encoding():
+    # gpt-4o / gpt-4o-mini tokenizer; loaded on first use (tiktoken may download it)
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        print("tiktoken unavailable, estimating tokens from length:", e)
+        return None
+
+
+def count_tokens(text: str) -> int:
+    enc = _encoding()
+    return len(enc.encode(text)) if enc else (len(text) + 3) // 4
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    enc = _encoding()
+    return enc.decode(enc.encode(text)[:max_tokens]) if enc else text[: max_tokens * 4]
+
+
+def _shingles(text: str, n: int = 3) -> set:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < n:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def _is_near_duplicate(shingles: set, kept: list[set]) -> bool:
+    for other in kept:
+        union = len(shingles | other)
+        if union and len(shingles & other) / union >= DUPLICATE_THRESHOLD:
+            return True
+    return False
+
+
+def parse_docs(docs, max_tokens: int = CONTEXT_TOKEN_BUDGET):
     """
     Keep only valid text documents (filters out empty/malformed ones).
+    Near-identical chunks are dropped and the rest are packed, best score first,
+    until `max_tokens` of context is used; the first chunk that does not fit is
+    truncated to the remaining budget.
     Returns format compatible with original multimodal prompt structure.
     """
-    texts = []
+    scored = []
     for doc in docs:
         content = getattr(doc, "page_content", str(doc))
         if content.strip():
-            texts.append(Document(page_content=content))
+            score = getattr(doc, "metadata", {}).get("score", 0.0)
+            scored.append((score, content))
+    # Stable sort keeps retriever order for unscored documents
+    scored.sort(key=lambda x: x[0], reverse=True)
+
+    texts, kept, used = [], [], 0
+    for _, content in scored:
+        shingles = _shingles(content)
+        if _is_near_duplicate(shingles, kept):
+            continue
+        tokens = count_tokens(content)
+        if used + tokens > max_tokens:
+            # Better part of a highly ranked chunk than no context at all
+            if max_tokens - used > 0:
+                texts.append(Document(page_content=truncate_tokens(content, max_tokens - used)))
+            break
+        texts.append(Document(page_content=content))
+        kept.append(shingles)
+        used += tokens
     return { "texts": texts}  
 
 def build_prompt(kwargs):
@@ -29,13 +95,15 @@ def build_prompt(kwargs):
     }]
     return ChatPromptTemplate.from_messages([HumanMessage(content=prompt)])
 
-def create_rag_chain(retriever):
+def create_rag_chain(max_context_tokens: int = CONTEXT_TOKEN_BUDGET):
     """
     Final RAG chain.
+    Takes {"docs": <retrieved documents>, "question": str} so the caller retrieves only once.
     """
     return (
-        {"context": retriever | RunnableLambda(parse_docs), "question": RunnablePassthrough()}
+        {"context": itemgetter("docs") | RunnableLambda(lambda docs: parse_docs(docs, max_context_tokens)),
+         "question": itemgetter("question")}
         | RunnableLambda(build_prompt)
-        | ChatOpenAI(model="gpt-4o-mini")
+        | ChatOpenAI(model="gpt-4o-mini", **openai_client_kwargs())
         | StrOutputParser()
     )
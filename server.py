@@ -0,0 +1,212 @@
+"""
+Headless ASGI API for the portfolio supervisor, for other services and many concurrent users.
+
+    uvicorn server:app --host 0.0.0.0 --port 8000
+
+POST /query         → {"answer", "thread_id"} once the supervisor has finished
+POST /query/stream  → Server-Sent Events: one "update" per agent step, then "final" (or "error")
+GET  /healthz       → active queries, outbound call metrics and resident indexes
+
+Queries run on the event loop with astream / ainvoke; the agents' tools have async
+versions, so one worker process serves many overlapping queries.
+"""
+import os
+import json
+import uuid
+import asyncio
+import datetime
+import weakref
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from langchain_core.messages import AIMessage, convert_to_messages
+from supervisor import build_prompt, build_supervisor, date_context_message
+from agents.memory import create_checkpointer, compact_history
+from retrieval.index_manager import index_manager, DEFAULT_CLIENT
+from outbound import metrics
+
+# Queries running at once; further requests wait up to QUEUE_WAIT_SECONDS for a slot
+MAX_CONCURRENT_QUERIES = int(os.getenv("MAX_CONCURRENT_QUERIES", "16"))
+QUEUE_WAIT_SECONDS = float(os.getenv("QUEUE_WAIT_SECONDS", "5"))
+# Default and upper bound for a request's own "timeout"
+QUERY_TIMEOUT_SECONDS = float(os.getenv("QUERY_TIMEOUT_SECONDS", "120"))
+
+
+class ServerBusy(Exception):
+    """No query slot became free within QUEUE_WAIT_SECONDS."""
+
+
+class QueryRequest(BaseModel):
+    question: str = Field(min_length=1)
+    client_id: str = DEFAULT_CLIENT
+    # Pass back the returned thread_id to continue a conversation
+    thread_id: str | None = None
+    timeout: float | None = Field(default=None, gt=0)
+
+
+app = FastAPI(title="Portfolio-GPT API")
+checkpointer = create_checkpointer()
+_slots = asyncio.Semaphore(MAX_CONCURRENT_QUERIES)
+_active = 0
+# The prompt embeds today's date, so the graph is recompiled once per day
+_supervisor = {"date": None, "graph": None}
+# One lock per conversation thread: turns of the same thread run one at a time
+_thread_locks = weakref.WeakValueDictionary()
+
+
+def get_supervisor():
+    today = datetime.date.today()
+    if _supervisor["date"] != today:
+        _supervisor["graph"] = build_supervisor(build_prompt(today), checkpointer)
+        _supervisor["date"] = today
+    return _supervisor["graph"]
+
+
+def thread_config(req: QueryRequest) -> tuple[str, dict]:
+    thread_id = req.thread_id or uuid.uuid4().hex
+    # Threads are namespaced by client so one client cannot read another's conversation
+    return thread_id, {"configurable": {"thread_id": f"{req.client_id}:{thread_id}",
+                                        "client_id": req.client_id}}
+
+
+def query_timeout(req: QueryRequest) -> float:
+    return min(req.timeout or QUERY_TIMEOUT_SECONDS, QUERY_TIMEOUT_SECONDS)
+
+
+class Deadline:
+    """Spreads one query timeout over several awaits (asyncio.wait_for, so it runs on Python 3.10)."""
+
+    def __init__(self, seconds: float):
+        self.loop = asyncio.get_running_loop()
+        self.at = self.loop.time() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.at - self.loop.time())
+
+    async def run(self, aw):
+        return await asyncio.wait_for(aw, self.remaining())
+
+
+@asynccontextmanager
+async def query_slot(config: dict, deadline: Deadline):
+    """
+    Per-thread serialization, then the concurrency cap. A turn waiting on an earlier
+    turn of its thread holds no slot, and every wait counts against the deadline.
+    Raises ServerBusy when no slot frees up within QUEUE_WAIT_SECONDS.
+    """
+    global _active
+    lock = _thread_locks.setdefault(config["configurable"]["thread_id"], asyncio.Lock())
+    await deadline.run(lock.acquire())
+    try:
+        wait = min(QUEUE_WAIT_SECONDS, deadline.remaining())
+        try:
+            await asyncio.wait_for(_slots.acquire(), wait)
+        except asyncio.TimeoutError:
+            if wait < QUEUE_WAIT_SECONDS:
+                raise    # the query's own deadline ran out first
+            raise ServerBusy() from None
+        _active += 1
+        try:
+            yield
+        finally:
+            _active -= 1
+            _slots.release()
+    finally:
+        lock.release()
+
+
+async def prepare(graph, config: dict, question: str) -> dict:
+    # Compaction may summarize old turns with a blocking LLM call
+    await asyncio.to_thread(compact_history, graph, config)
+    return {"messages": [date_context_message(), {"role": "user", "content": question}]}
+
+
+def final_answer(messages) -> str:
+    for msg in reversed(messages):
+        if isinstance(msg, AIMessage) and msg.content:
+            return msg.content
+    return ""
+
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@app.post("/query")
+async def query(req: QueryRequest):
+    graph = get_supervisor()
+    thread_id, config = thread_config(req)
+    deadline = Deadline(query_timeout(req))
+    try:
+        async with query_slot(config, deadline):
+            inputs = await deadline.run(prepare(graph, config, req.question))
+            result = await deadline.run(graph.ainvoke(inputs, config))
+    except ServerBusy as e:
+        raise HTTPException(503, "Too many concurrent queries", headers={"Retry-After": "5"}) from e
+    except asyncio.TimeoutError as e:
+        raise HTTPException(504, f"Query exceeded {query_timeout(req):.0f}s") from e
+    return {"answer": final_answer(result["messages"]), "thread_id": thread_id}
+
+
+async def stream_events(req: QueryRequest):
+    graph = get_supervisor()
+    thread_id, config = thread_config(req)
+    deadline = Deadline(query_timeout(req))
+    try:
+        async with query_slot(config, deadline):
+            yield sse("start", {"thread_id": thread_id})
+            inputs = await deadline.run(prepare(graph, config, req.question))
+            steps = graph.astream(inputs, config, subgraphs=True)
+            try:
+                while True:
+                    try:
+                        ns, update = await deadline.run(steps.__anext__())
+                    except StopAsyncIteration:
+                        break
+                    agent = ns[-1].split(":")[0] if ns else "supervisor"
+                    for node, node_update in update.items():
+                        if not node_update or "messages" not in node_update:
+                            continue
+                        last = convert_to_messages(node_update["messages"])[-1]
+                        yield sse("update", {
+                            "agent": agent,
+                            "node": node,
+                            "type": last.type,
+                            "content": last.content,
+                            "tool_calls": [c["name"] for c in getattr(last, "tool_calls", None) or []],
+                        })
+            finally:
+                await steps.aclose()
+            state = await deadline.run(graph.aget_state(config))
+            yield sse("final", {"answer": final_answer(state.values["messages"]), "thread_id": thread_id})
+    except ServerBusy:
+        yield sse("error", {"error": "Too many concurrent queries", "thread_id": thread_id})
+    except asyncio.TimeoutError:
+        yield sse("error", {"error": f"Query exceeded {query_timeout(req):.0f}s", "thread_id": thread_id})
+    except Exception as e:
+        yield sse("error", {"error": f"{type(e).__name__}: {e}", "thread_id": thread_id})
+
+
+@app.post("/query/stream")
+async def query_stream(req: QueryRequest):
+    return StreamingResponse(
+        stream_events(req),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/healthz")
+async def healthz():
+    return {
+        "active_queries": _active,
+        "max_concurrent_queries": MAX_CONCURRENT_QUERIES,
+        "outbound": metrics(),
+        "indexes": index_manager.snapshot(),
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host=os.getenv("HOST", "0.0.0.0"), port=int(os.getenv("PORT", "8000")))
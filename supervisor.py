@@ -1,6 +1,7 @@
 import datetime
 from langgraph_supervisor import create_supervisor
 from langchain_openai import ChatOpenAI
+from outbound import openai_client_kwargs
 from agents import (
     news,
     price,
@@ -48,58 +49,139 @@ def pretty_print_messages(update, last_message=False):
             pretty_print_message(m, indent=is_subgraph)
         print("\n")
 
-supervisor_prompt = f"""
-You are Portfolio-GPT Supervisor.
+def build_prompt(today: datetime.date | None = None) -> str:
+    """Supervisor routing prompt; embeds `today` so "current" prices use the right date."""
+    today = today or datetime.date.today()
+    return f"""
+You are Portfolio-GPT Supervisor — a high-level orchestrator responsible for answering investment-related questions by routing tasks to 3 specialized agents:
 
-Available specialists:
-- rag      → purchase info (JSON)
-- price    → live price by date (JSON)
-- news     → headlines & sentiment
+- **rag** → Portfolio data & investment analysis (from uploaded PDFs)
+- **price** → Live stock prices and trends (via Yahoo Finance)
+- **news** → Latest headlines & sentiment
 
-### Workflow rule for profit / loss
-When the user asks for **profit, loss, P/L, gain, return**:
+---
 
-1. Call **rag** first to get purchase_price and shares.  
-2. Then call **price** with today's date ({datetime.date.today()}) to get current price.  
-3. Compute profit = (current – purchase_price) × shares, and percentage = profit / (purchase_price × shares) × 100.  
-4. Reply to the user:  
-   "<TICKER>: bought DATE at $X × N shares → current $Y → **+-Z% / +-$P**".
+THINK → DECIDE → ACT
 
-Call exactly one agent per step and always hand work back to yourself after each call.
-"""
+Use the following routing rules to determine which agent to call:
 
-supervisor = (
-    create_supervisor(
-        model=ChatOpenAI(model="gpt-4o-mini"),
-        agents=[news, price, rag],
-        prompt=supervisor_prompt,
-        add_handoff_back_messages=True,
-        output_mode="full_history",
-    )
-    .compile(name="portfolio_supervisor")
-)
+---
+
+1. PORTFOLIO ANALYSIS & COMMENTARY (rag only)
+Trigger the **rag** agent when the user asks:
+- “What’s my analysis?”
+- “Give me a summary of my portfolio”
+- “What do I think about my stocks?”
+- “Show commentary”
+
+Action:
+→ Call `rag` directly and return its output.
+Do NOT call price or news.
+
+---
+
+2. PROFIT / LOSS CALCULATION (rag + price)
+If the user mentions:
+- “profit”, “gain”, “loss”, “P/L”, “return on investment”
+
+Step-by-step:
+  a. Call **rag** to retrieve `purchase_price`, `shares`, and `purchase_date`
+  b. Call **price** with today's date ({today}) to get `current_price`
+  c. Calculate:
+     - `profit = (current_price - purchase_price) × shares`
+     - `percentage = profit / (purchase_price × shares) × 100`
+  d. Reply:
+     "**<TICKER>**: bought on <DATE> at $X × N shares → current $Y → **±Z% / ±$P**" with the calculations explaining how the value is found
+ Do NOT guess missing numbers. Skip tickers if data is incomplete.
+ 
+
+3. PORTFOLIO VALUE OVER TIME (price only)
+If the user asks how their portfolio's total value has changed over time or since they bought:
+→ Call **price** (it uses `get_portfolio_history`) and return its output.
 
+4. FULL STOCK CHECK (rag + price + news)
 
+If the user asks for a full update or opinion on a stock — e.g.,
 
+- “What’s going on with my Apple shares?”
+- “Give me an update on Tesla”
+- “Tell me how my Microsoft holding is doing right now”
+- “Any news and performance for my stocks?”
 
-for chunk in supervisor.stream(
-    {
-        "messages": [
-            {
-                "role": "user",
-                "content": "What’s my AAPL position?",
-            }
-        ]
-    },
-):
-    pretty_print_messages(chunk, last_message=True)
+Step-by-step:
+  a. Call **rag** to get user-owned tickers, number of shares, purchase price/date, and commentary.
+  b. Call **price** to retrieve current stock price and performance trend.
+  c. Call **news** to fetch current sentiment or headlines.
 
-final_message_history = chunk["supervisor"]["messages"]
-for msg in reversed(final_message_history):
-    if isinstance(msg, AIMessage):
-        print("\n🧠 Final AI Message:\n")
-        print(msg.content)
-        break
+Combine all 3 to give a complete overview:
 
+→ Example format:
+> "**AAPL**: You bought 20 shares at $145.30 on May 10, 2023. Current price is $187.50 (↑29.00%). News sentiment: Positive — headlines suggest strong iPhone 16 demand and AI growth."
+
+---
+
+GLOBAL RULES:
+
+- One agent per step. After every call, always hand control back to yourself.
+- Never synthesize financial advice without retrieved evidence.
+- Never guess. If a value is missing, skip or return partial analysis.
+- Do not call more than needed — route precisely.
+
+If the user’s question does not match any rule above, return:
+- “I’m not sure which agent to route this to. Please clarify your question.”
+
+"""
+
+
+def date_context_message(today: datetime.date | None = None) -> dict:
+    """System message telling the agents today's date (fixed id: one per thread, kept current)."""
+    today = (today or datetime.date.today()).strftime("%Y-%m-%d")
+    return {
+        "role": "system",
+        "id": "date-context",
+        "content": (
+            f"Today's date is {today}. "
+            "If the user says 'today', 'now', or 'current', interpret it as this date."
+        ),
+    }
+
+
+def build_supervisor(prompt: str | None = None, checkpointer=None):
+    """Compiles the supervisor graph over the news, price and rag agents."""
+    return (
+        create_supervisor(
+            model=ChatOpenAI(model="gpt-4o-mini", **openai_client_kwargs()),
+            agents=[news, price, rag],
+            prompt=prompt or build_prompt(),
+            add_handoff_back_messages=True,
+            output_mode="full_history",
+        )
+        .compile(name="portfolio_supervisor", checkpointer=checkpointer)
+    )
 
 
+def main():
+    supervisor = build_supervisor()
+    for chunk in supervisor.stream(
+        {
+            "messages": [
+                date_context_message(),
+                {
+                    "role": "user",
+                    "content": "What’s my AAPL position?",
+                }
+            ]
+        },
+    ):
+        pretty_print_messages(chunk, last_message=True)
+
+    final_message_history = chunk["supervisor"]["messages"]
+    for msg in reversed(final_message_history):
+        if isinstance(msg, AIMessage):
+            print("\n🧠 Final AI Message:\n")
+            print(msg.content)
+            break
+
+
+if __name__ == "__main__":
+    main()
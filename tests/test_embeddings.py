@@ -0,0 +1,18 @@
+import pytest
+from langchain_openai import OpenAIEmbeddings
+from outbound import PolicyTransport
+from retrieval.embeddings import EMBEDDING_BACKEND, get_embeddings, embedding_signature
+
+
+@pytest.mark.skipif(EMBEDDING_BACKEND != "openai", reason="EMBEDDING_BACKEND overrides the default")
+def test_default_backend_builds_openai_embeddings(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    get_embeddings.cache_clear()
+
+    embeddings = get_embeddings()
+
+    assert isinstance(embeddings, OpenAIEmbeddings)
+    # Requests go through the shared outbound policy, which owns retries
+    assert isinstance(embeddings.http_client._transport, PolicyTransport)
+    assert embeddings.max_retries == 0
+    assert embedding_signature(embeddings)["embedding_backend"] == "openai"
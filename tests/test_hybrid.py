@@ -0,0 +1,73 @@
+import zlib
+import numpy as np
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from retrieval.faiss_store import build_vectorstore
+from retrieval.hybrid import HybridRetriever, HOLDINGS_FIELD, extract_metadata, tokenize
+
+
+class BagOfWords(Embeddings):
+    """Hashed bag-of-words vectors, so dense similarity follows shared words."""
+
+    def _embed(self, text):
+        v = np.zeros(64, dtype="float32")
+        for token in tokenize(text):
+            v[zlib.crc32(token.encode()) % 64] += 1
+        return (v / (np.linalg.norm(v) or 1)).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+DISCLAIMER = "The fund IS NOT a bank deposit. ALL investments carry risk. NVDA is not a recommendation."
+REVIEW = "Portfolio review: the portfolio is doing well this year with steady gains."
+TEXTS = [
+    DISCLAIMER,
+    REVIEW,
+    "Bought 10 shares of AAPL at 150 on 2023-01-05.",
+    "Bought 5 shares of MSFT at 300 on 2023-02-01.",
+    "Year in review: steady gains this year.",
+]
+
+
+def make_retriever(**kwargs) -> HybridRetriever:
+    docs = [Document(page_content=t, metadata=extract_metadata(t)) for t in TEXTS]
+    docs.append(Document(page_content="| Ticker | Shares |\n| AAPL | 10 |\n| MSFT | 5 |",
+                         metadata={**extract_metadata("AAPL MSFT"), HOLDINGS_FIELD: ["AAPL", "MSFT"]}))
+    return HybridRetriever(vectorstore=build_vectorstore(docs, BagOfWords(), "flat"), **kwargs)
+
+
+def contents(docs):
+    return [d.page_content for d in docs]
+
+
+def test_lower_case_words_are_not_tickers():
+    retriever = make_retriever()
+    assert retriever._prefilter("what is the review") is None
+    assert retriever._prefilter("Is my portfolio doing well? what is it all about") is None
+    docs = retriever.invoke("Is my portfolio doing well? what is it all about")
+    assert contents(docs)[0] == REVIEW
+    assert len(docs) > 1
+
+
+def test_tickers_named_in_upper_case_cashtag_or_as_known_holdings():
+    retriever = make_retriever()
+    for query in ("How did AAPL do?", "how did $aapl do?", "how did aapl do?"):
+        matched = {retriever._docs[i].page_content for i in retriever._prefilter(query)}
+        assert TEXTS[2] in matched and TEXTS[3] not in matched
+
+
+def test_prefilter_far_from_the_query_falls_back_to_global_results():
+    retriever = make_retriever(fetch_k=2)
+    # NVDA only appears in the disclaimer, which is not among the dense top 2
+    assert contents(retriever.invoke("NVDA portfolio review doing well this year"))[0] == REVIEW
+
+
+def test_too_few_prefiltered_chunks_are_followed_by_global_results():
+    retriever = make_retriever(k=3)
+    docs = contents(retriever.invoke("NVDA portfolio review doing well this year"))
+    assert docs[0] == DISCLAIMER
+    assert REVIEW in docs and len(docs) == 3
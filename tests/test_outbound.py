@@ -0,0 +1,165 @@
+import gzip
+import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+import pytest
+from outbound import OutboundPolicy, PolicyTransport, AsyncPolicyTransport, CircuitOpenError, policy
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_policy(**kwargs) -> OutboundPolicy:
+    opts = {"rate": 1000.0, "burst": 1000, "concurrency": 16, "max_retries": 3,
+            "base_delay": 0.01, "max_delay": 1.0, "sleep": lambda s: None, "rng": lambda: 0.0}
+    return OutboundPolicy("test", **{**opts, **kwargs})
+
+
+def quiet_transport_policy(backend: str) -> list[float]:
+    """Makes the shared `backend` policy record its sleeps instead of sleeping."""
+    sleeps = []
+    pol = policy(backend)
+    pol.sleep = sleeps.append
+    pol.rng = lambda: 0.0
+    return sleeps
+
+
+def gzip_json(payload: dict) -> httpx.Response:
+    return httpx.Response(200, headers={"content-encoding": "gzip", "content-type": "application/json"},
+                          content=gzip.compress(json.dumps(payload).encode()))
+
+
+def test_gzip_response_passes_through_sync_transport():
+    quiet_transport_policy("test-gzip")
+    transport = PolicyTransport("test-gzip", httpx.MockTransport(lambda request: gzip_json({"ok": True})))
+    with httpx.Client(transport=transport) as client:
+        assert client.post("http://stub/v1/embeddings", json={"input": "x"}).json() == {"ok": True}
+
+
+def test_gzip_response_passes_through_async_transport():
+    async def run():
+        transport = AsyncPolicyTransport("test-gzip-async", httpx.MockTransport(lambda request: gzip_json({"ok": True})))
+        async with httpx.AsyncClient(transport=transport) as client:
+            return (await client.post("http://stub/v1/embeddings", json={"input": "x"})).json()
+
+    assert asyncio.run(run()) == {"ok": True}
+
+
+def test_429_then_200_is_retried_once_honouring_retry_after():
+    sleeps = quiet_transport_policy("test-429")
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        if len(seen) == 1:
+            return httpx.Response(429, headers={"retry-after": "0.7"})
+        return httpx.Response(200, json={"ok": True})
+
+    before = policy("test-429").snapshot()["retries"]
+    with httpx.Client(transport=PolicyTransport("test-429", httpx.MockTransport(handler))) as client:
+        res = client.post("http://stub/v1/chat/completions", json={"messages": ["hi"]})
+    assert res.status_code == 200
+    assert len(seen) == 2
+    assert policy("test-429").snapshot()["retries"] - before == 1
+    # Jitter is 0 here, so the only backoff is the server's Retry-After
+    assert 0.7 in sleeps
+
+
+def test_retries_exhausted_returns_the_status_to_the_sdk():
+    quiet_transport_policy("test-503")
+    pol = policy("test-503")
+    transport = PolicyTransport("test-503", httpx.MockTransport(lambda request: httpx.Response(503)))
+    with httpx.Client(transport=transport) as client:
+        assert client.get("http://stub/v1/models").status_code == 503
+    assert pol.snapshot()["attempts"] == pol.max_retries + 1
+
+
+def test_breaker_opens_and_lets_one_half_open_probe_through():
+    clock = FakeClock()
+    pol = make_policy(max_retries=0, breaker_threshold=2, breaker_reset=10.0, clock=clock)
+    calls = []
+
+    def down():
+        calls.append("down")
+        raise ConnectionError("reset")
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            pol.call(down)
+    assert pol.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        pol.call(down)
+    assert calls == ["down", "down"]
+
+    clock.now += 10.0
+    probe_started, release = threading.Event(), threading.Event()
+
+    def probe():
+        calls.append("probe")
+        probe_started.set()
+        release.wait(5)
+        return "up"
+
+    with ThreadPoolExecutor(1) as pool:
+        fut = pool.submit(pol.call, probe)
+        assert probe_started.wait(5)
+        # Only one probe while half-open; everyone else still fails fast
+        with pytest.raises(CircuitOpenError):
+            pol.call(probe)
+        release.set()
+        assert fut.result(5) == "up"
+    assert calls.count("probe") == 1
+    assert pol.breaker.state == "closed"
+
+
+def test_identical_concurrent_calls_reach_the_backend_once():
+    pol = make_policy()
+    n = 10
+    hits = []
+
+    def backend(query):
+        hits.append(query)
+        # Stay in flight until every other caller has joined this call
+        deadline = time.monotonic() + 5
+        while pol.snapshot()["coalesced"] < n - 1 and time.monotonic() < deadline:
+            time.sleep(0.005)
+        return f"ok:{query}"
+
+    with ThreadPoolExecutor(n) as pool:
+        results = list(pool.map(lambda _: pol.call(backend, "q", key="q"), range(n)))
+    assert results == ["ok:q"] * n
+    assert hits == ["q"]
+    assert pol.snapshot()["coalesced"] == n - 1
+
+
+def test_cancelled_leader_releases_its_followers():
+    pol = make_policy()
+    hits = []
+
+    async def backend(x):
+        hits.append(x)
+        await asyncio.sleep(0.2)
+        return x
+
+    async def run():
+        leader = asyncio.create_task(pol.acall(backend, 1, key="k"))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(pol.acall(backend, 1, key="k"))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.wait_for(follower, 2)
+
+    assert asyncio.run(run()) == 1
+    # The follower took over the call instead of waiting on the cancelled one
+    assert hits == [1, 1]
+    assert pol.breaker.state == "closed"
@@ -0,0 +1,37 @@
+import json
+from agents.portfolio_value import load_lots
+
+AAPL = {"ticker": "AAPL", "purchase_date": "2023-01-05", "price": 150.0, "shares": 10}
+MSFT = {"ticker": "MSFT", "purchase_date": "2023-02-01", "price": 300.0, "shares": 5}
+
+
+def write_summaries(tmp_path, items) -> str:
+    path = tmp_path / "summaries.json"
+    path.write_text(json.dumps(items))
+    return str(path)
+
+
+def test_lots_repeated_across_tables_count_once(tmp_path):
+    path = write_summaries(tmp_path, [
+        {"type": "table", "sources": ["markdown"], "rows": [AAPL, MSFT]},
+        # Same table found by the pdf extractor with a different fingerprint
+        {"type": "table", "sources": ["pdf"], "rows": [{**AAPL, "ticker": "aapl", "price": "150"}, MSFT]},
+    ])
+    assert sorted(lot["ticker"] for lot in load_lots(path)) == ["AAPL", "MSFT"]
+
+
+def test_identical_buys_within_one_table_are_kept(tmp_path):
+    path = write_summaries(tmp_path, [
+        {"type": "table", "sources": ["markdown"], "rows": [MSFT, MSFT]},
+        {"type": "table", "sources": ["pdf"], "rows": [MSFT]},
+    ])
+    assert len(load_lots(path)) == 2
+
+
+def test_bullets_from_duplicate_tables_count_once(tmp_path):
+    bullet = "- MSFT: 5 shares @ 300 (bought 2023-02-01)"
+    path = write_summaries(tmp_path, [
+        {"type": "purchase_entry", "raw": "table one", "summary": bullet},
+        {"type": "purchase_entry", "raw": "table two", "summary": bullet},
+    ])
+    assert len(load_lots(path)) == 1
@@ -0,0 +1,23 @@
+from langchain.schema import Document
+from retrieval.hybrid import HybridRetriever
+from retrieval.retriever import parse_docs, count_tokens
+
+
+def test_top_chunk_larger_than_the_budget_is_truncated_not_dropped():
+    big = Document(page_content="dividend " * 3000, metadata={"score": 0.9})
+    small = Document(page_content="Bought 10 shares of AAPL.", metadata={"score": 0.5})
+    texts = parse_docs([small, big], max_tokens=500)["texts"]
+    assert len(texts) == 1
+    assert texts[0].page_content.startswith("dividend")
+    assert 0 < count_tokens(texts[0].page_content) <= 500
+
+
+def test_budget_packs_best_chunks_then_fills_with_the_next():
+    docs = [Document(page_content=f"chunk {i} " + "x " * 100, metadata={"score": 1 - i / 10}) for i in range(5)]
+    texts = parse_docs(docs, max_tokens=3 * count_tokens(docs[0].page_content) + 10)["texts"]
+    assert [t.page_content.split()[1] for t in texts] == ["0", "1", "2", "3"]
+    assert count_tokens(texts[-1].page_content) <= 10
+
+
+def test_retriever_returns_enough_candidates_for_the_budget():
+    assert HybridRetriever.model_fields["k"].default == HybridRetriever.model_fields["fetch_k"].default
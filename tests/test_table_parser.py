@@ -0,0 +1,20 @@
+from preprocessing.table_parser import map_columns, parse_purchase_table
+
+
+def test_market_price_columns_are_not_the_purchase_price():
+    assert map_columns(["Stock", "Date", "Current Price", "Quantity"]) is None
+    assert map_columns(["Stock", "Date", "Purchase Price", "Current Price", "Quantity"])["price"] == 2
+    assert map_columns(["Ticker", "Date", "Market Price", "Price Paid", "Shares"])["price"] == 3
+    assert map_columns(["Ticker", "Date", "Price", "Shares", "Today's Price"])["price"] == 2
+
+
+def test_table_with_only_a_market_price_goes_to_the_llm():
+    table = "| Stock | Date | Last Price | Qty |\n|---|---|---|---|\n| AAPL | 2023-01-05 | 190 | 10 |"
+    assert parse_purchase_table(table) is None
+
+
+def test_purchase_table_is_parsed_locally():
+    table = "| Ticker | Purchase Date | Price | Shares |\n|---|---|---|---|\n| AAPL | 01/05/2023 | $150.00 | 10 |"
+    assert parse_purchase_table(table) == [
+        {"ticker": "AAPL", "purchase_date": "2023-01-05", "price": 150.0, "shares": 10},
+    ]